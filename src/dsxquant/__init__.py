@@ -6,6 +6,8 @@ config.DEFAULT_SERVER_IP = "129.211.209.104"
 config.DEFAULT_PORT = 8085
 from dsxquant.config.config import MARKET,EventType,PositionStatus,BaseSymbol,FQ,MARKET_VAL
 from dsxquant.dataser.dsx_dataser import DsxDataser
+from dsxquant.dataser.async_dsx_dataser import AsyncDsxDataser
+from dsxquant.dataser.snapshot import MarketSnapshot
 from dsxquant.dataser.parser.base import BaseParser
 from dsxquant.config.logconfig import logger
 from dsxquant.engins.engin import Engin
@@ -32,8 +34,12 @@ Fq = config.FQ
 report_type = config.REPORT_TYPE
 # 数据采集器
 dataser = DsxDataser
+# asyncio 数据采集器
+asyncdataser = AsyncDsxDataser
 # 解析器
 parser = BaseParser
+# 全市场行情快照
+snapshot = MarketSnapshot
 # 默认维护一个连接
 conn:DsxDataser = DsxDataser()
 def close():
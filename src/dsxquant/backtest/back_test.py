@@ -1,10 +1,11 @@
 import os
 import threading
 import time
-from typing import List
+from collections import deque
+from typing import Deque, List
 
 import pandas
-from dsxquant.engins.event_bus import EventBus
+from dsxquant.engins.event_bus import EventBus,SyncEventBus
 from dsxquant.engins.event_model import EventModel
 from dsxquant import EventType
 from dsxquant import logger
@@ -29,8 +30,12 @@ class BackTest:
         """
         self.strategy = strategy
         self.exit = False
-        self.events:List[EventModel] = []
+        self.events:Deque[EventModel] = deque()
         self.event:EventModel = None
+        # 没有事件时回测线程在条件变量上等待
+        self.cond = threading.Condition()
+        # 回测结束
+        self.finished = threading.Event()
         # 回测参数
         # 回测区间 %Y%m%d
         self.start_date = start
@@ -56,11 +61,14 @@ class BackTest:
         self.export_path = export_path
         # 回测天数
         self.days = 0
+        # 单线程回测时自己创建的策略引擎
+        self.sync_engin:StrategyEngin = None
 
     @property
     def strategy_engin(self) ->StrategyEngin:
-        """去系统找
+        """去系统找，单线程回测时用自己的
         """
+        if self.sync_engin: return self.sync_engin
         return Engin.get_instance().get_app(StrategyEngin)
 
     @property
@@ -76,10 +84,17 @@ class BackTest:
         Args:
             event (EventModel): _description_
         """
-        self.events.append(event)
+        with self.cond:
+            self.events.append(event)
+            self.cond.notify()
     
+    def subscriptions(self) -> list:
+        """向总线声明订阅的事件，只接收数据引擎发给本次回测的事件
+        """
+        return [(self,None)]
+
     def get_current_event(self):
-        if self.events.__len__()>0:
+        if self.events:
             self.event = self.events[0]
             return self.event
         
@@ -95,29 +110,63 @@ class BackTest:
         self.load_datas()
         return self
 
+    def run_sync(self):
+        """单线程直接执行回测，不经过事件总线，也不需要启动系统引擎
+        数据由 DataFeed 下载，每根K线直接调用策略的 load/execute_all，
+        交易信号在当前线程由仿真交易引擎撮合，订单结果和事件驱动的回测一致，适合研究和参数寻优
+
+        Returns:
+            BackTest: 完成后可以直接 show()
+        """
+        from dsxquant import DataFeed,EmulationEngin
+        bus = SyncEventBus()
+        self.sync_engin = StrategyEngin()
+        self.sync_engin.register(self.strategy)
+        bus.install(self.sync_engin,EmulationEngin())
+        BackTest.last_backtest.append(self)
+        logger.info("启动[%s][%s]单线程回测...." % (self.symbol,self.strategy.__title__))
+        etype = None
+        if self.data==EventType.DAYLINE: etype = EventType.DAYBAR
+        if self.data in (EventType.MIN1LINE,EventType.MIN5LINE,EventType.MIN15LINE,EventType.MIN30LINE,EventType.MIN60LINE): etype = EventType.MINBAR
+        cycle = DataFeed.get_cycle(self.data)
+        klines = cycle and DataFeed().load(cycle,(self.symbol,self.market,self.fq,self.start_date,self.end_date,self.base_symbol))
+        if klines and etype:
+            symbol,market,datas = klines
+            data = (symbol,market,datas,self.norisk)
+            self.days = len(datas)
+            for i in range(len(datas)):
+                if self.exit: break
+                bus.register(EventModel(bus,etype,data,StrategyEngin,i,source=self))
+            # 结束传送，和事件驱动的回测一样通知策略引擎
+            bus.register(EventModel(bus,EventType.THEEND,data=self.last_backtest,target=StrategyEngin,source=self))
+        bus.shutdown()
+        self.finished.set()
+        logger.debug("回测[%s]结束" % self.symbol)
+        return self
+
     def shutdown(self):
         self.exit = True
+        with self.cond:
+            self.cond.notify_all()
         
     
     def show(self,show_order:bool=False,show_position:bool=False):
         """显示回测结果
         """
         
-        while True:
-            time.sleep(0.1)
-            if isinstance(self.event,EventModel):
-                if self.event.type==EventType.THEEND:
-                    # 结束回测
-                    break
-            # time.sleep(1)
+        # 等待回测线程收到结束事件
+        self.finished.wait()
         
         self.on_finished(show_order,show_position)
         self.close()
 
     def destroy(self):
-        if self.events.__len__()>0:
-            if self.event in self.events:
-                self.events.remove(self.event)
+        if self.event is not None and self.events:
+            with self.cond:
+                if self.events[0] is self.event:
+                    self.events.popleft()
+                elif self.event in self.events:
+                    self.events.remove(self.event)
         self.event = None
 
     def run(self):
@@ -130,6 +179,7 @@ class BackTest:
                     break
             self.destroy()
             self.next()
+        self.finished.set()
         logger.debug("回测[%s]结束" % self.symbol)
     
 
@@ -219,13 +269,13 @@ class BackTest:
         self.export(self.base_symbol,base_orders,show_order,show_position)
 
     def sendevent(self,event:EventModel):
-        """给策略引擎发送事件
+        """给策略引擎发送事件，策略引擎积压满时等待
 
         Args:
             event (EventModel): _description_
         """
         if self.strategy_engin and event:
-            self.strategy_engin.receive(event)
+            self.strategy_engin.put(event)
     
     def sendbus(self,event:EventModel):
         """给总线发送事件
@@ -238,8 +288,10 @@ class BackTest:
                 event.bus.register(event)
     
     def next(self):
+        # 没有事件时阻塞，不再空转
+        with self.cond:
+            self.cond.wait_for(lambda: self.exit or self.events)
         self.get_current_event()
-        pass
 
     def load_datas(self):
         if self.symbol:
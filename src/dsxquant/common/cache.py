@@ -1,8 +1,15 @@
 import datetime
-import json
 import os
 from dsxquant import MARKET,MARKET_VAL,config
 import dsxquant
+from dsxquant.common import codec
+from dsxquant.common.kline_store import KlineStore
+from dsxquant.common import kline_resample
+from dsxquant.common.sqlite_cache import SqliteCache
+from dsxquant.common.cache_manifest import CacheManifest
+from dsxquant.common.trade_calendar import TradeCalendar,SESSION_CLOSE
+from dsxquant.common.tick_store import TickStore
+import numpy
 class CacheHelper:
 
     encoding = "utf-8"
@@ -11,32 +18,56 @@ class CacheHelper:
     def clear():
         try:
             path = config.CACHE_PATH
+            CacheManifest.get_instance().reset()
             os.rmdir(path)
         except Exception as e:
             dsxquant.logger.error(e)
 
+    @staticmethod
+    def read_json(filename):
+        """读取json缓存文件，直接从字节解析
+
+        Returns:
+            any: 文件为空返回None
+        """
+        try:
+            with open(filename,mode="rb") as f:
+                content = f.read()
+        except FileNotFoundError:
+            # 清单里有但是已经被删除
+            CacheManifest.get_instance().remove(filename)
+            return
+        if content: return codec.loads(content)
+
+    @staticmethod
+    def write_json(filename,datas):
+        """写入json缓存文件
+        """
+        with open(filename,mode="wb") as f:
+            f.write(codec.dumpb(datas))
+        CacheManifest.get_instance().add(filename)
+
     @staticmethod
     def get_db_path(dir1,dir2,db):
         path = config.CACHE_PATH+"/"+db+"/"
         if dir1: path += dir1+"/"
         if dir2: path += dir2+"/"
-            
-        if not os.path.exists(path):
-            os.makedirs(path)
+        CacheManifest.get_instance().makedirs(path)
         return path
     
     @staticmethod
     def today_is_cache_date(path,update=False):
-        filename = path+"/last_date.txt"
-        if os.path.exists(filename):
-            with open(filename,mode="r",encoding=CacheHelper.encoding) as f:
-                content = f.read()
-                if content==datetime.datetime.now().strftime("%Y%m%d"):return True
+        """缓存是否有效，按交易日历判断是否包含最近一个已经收盘的交易时段
+        """
+        if TradeCalendar.get_instance().is_fresh(CacheManifest.get_instance().get_refreshed(path)):return True
     @staticmethod
     def save_cache_date(path):
-        filename = path+"/last_date.txt"
-        with open(filename,mode="w",encoding=CacheHelper.encoding) as f:
-                f.write(datetime.datetime.now().strftime("%Y%m%d"))
+        manifest = CacheManifest.get_instance()
+        now = datetime.datetime.now().strftime("%Y%m%d%H%M")
+        refreshed = manifest.get_refreshed(path)
+        # 当天已经记录过并且仍然有效时不用重写
+        if refreshed and refreshed[:8]==now[:8] and TradeCalendar.get_instance().is_fresh(refreshed): return
+        manifest.set_refreshed(path,now)
     
     @staticmethod
     def get_db_filename(symbol:str,market:MARKET,dir1,dir2,db):
@@ -50,104 +81,223 @@ class CacheHelper:
         return filename
         
     @staticmethod
-    def save_klines(symbol:str,market:MARKET,cycle,fq,datas:list):
+    def get_kline_filename(symbol:str,market:MARKET,cycle,fq):
+        """K线缓存文件，旧版本的json缓存会在这里转换成二进制格式
+        """
         db = "klines"
         if not fq: fq = "data"
         code = symbol
         if symbol[:2] not in MARKET_VAL:
             code = MARKET_VAL[market]+symbol
         fq = fq+"/"+code
-        filename = CacheHelper.get_db_filename(symbol,market,cycle,fq,db)
-        content = ""
-        if os.path.exists(filename):
-            with open(filename,mode="r",encoding=CacheHelper.encoding) as f:
-                content = f.read()
+        json_filename = CacheHelper.get_db_filename(symbol,market,cycle,fq,db)
+        filename = json_filename[:-4]+KlineStore.suffix
+        manifest = CacheManifest.get_instance()
+        if not manifest.exists(filename) and manifest.exists(json_filename):
+            content = CacheHelper.read_json(json_filename)
+            if isinstance(content,dict):
+                KlineStore.append(filename,KlineStore.parse(list(content.values())))
+                manifest.add(filename)
+            os.remove(json_filename)
+            manifest.remove(json_filename)
+        return filename
 
-        with open(filename,mode="w",encoding=CacheHelper.encoding) as f:
-            if content:
-                content = json.loads(content)
-                if isinstance(content,dict):
-                    dates = content.keys()
-                    for item in datas:
-                        obj = item.split(",")
-                        date = obj[0]
-                        if date not in dates:
-                            content[date] = item
-                f.write(json.dumps(content))
-            else:
-                content = {}
-                for item in datas:
-                    obj = item.split(",")
-                    date = obj[0]
-                    content[date] = item
-                f.write(json.dumps(content))
-        CacheHelper.save_cache_date(CacheHelper.get_db_path(cycle,fq,db))
-        
-                    
     @staticmethod
-    def get_klines(symbol:str,market:int,page:int=1,page_size:int=320,fq:str=config.FQ.DEFAULT,cycle:config.CYCLE=config.CYCLE.DAY,start:str=None,end:str=None):
-        db = "klines"
-        if not fq: fq = "data"
-        code = symbol
-        if symbol[:2] not in MARKET_VAL:
-            code = MARKET_VAL[market]+symbol
-        fq = fq+"/"+code
-        filename = CacheHelper.get_db_filename(symbol,market,cycle,fq,db)
-        if not os.path.exists(filename): return
+    def save_klines(symbol:str,market:MARKET,cycle,fq,datas:list,overwrite_last:bool=False):
+        filename = CacheHelper.get_kline_filename(symbol,market,cycle,fq)
+        # 只追加比缓存中最后日期新的K线
+        KlineStore.append(filename,KlineStore.parse(datas),overwrite_last)
+        CacheManifest.get_instance().add(filename)
+        CacheHelper.save_cache_date(os.path.dirname(filename))
+
+    @staticmethod
+    def set_klines_complete(symbol:str,market:int,fq:str=config.FQ.DEFAULT,cycle:config.CYCLE=config.CYCLE.DAY):
+        """标记K线缓存已经包含上市以来的全部K线，服务器返回的第一页不满时调用
+        """
+        KlineStore.set_complete(CacheHelper.get_kline_filename(symbol,market,cycle,fq))
+
+    @staticmethod
+    def get_klines_last_date(symbol:str,market:int,fq:str=config.FQ.DEFAULT,cycle:config.CYCLE=config.CYCLE.DAY) -> int:
+        """缓存中最后一根K线的日期，只读取尾部索引
+
+        Returns:
+            int: 日期 YYYYMMDD 或者 YYYYMMDDHHMM，没有缓存返回None
+        """
+        filename = CacheHelper.get_kline_filename(symbol,market,cycle,fq)
+        if not CacheManifest.get_instance().exists(filename): return
+        return KlineStore.tail(filename)[1]
+
+    @staticmethod
+    def remove_klines(symbol:str,market:int,fq:str=config.FQ.DEFAULT,cycle:config.CYCLE=config.CYCLE.DAY):
+        """删除K线缓存，前复权因子变化后历史K线都要重新请求
+        """
+        filename = CacheHelper.get_kline_filename(symbol,market,cycle,fq)
+        manifest = CacheManifest.get_instance()
+        for name in (filename,filename+KlineStore.index_suffix):
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass
+            manifest.remove(name)
+
+    @staticmethod
+    def get_klines_array(symbol:str,market:int,fq:str=config.FQ.DEFAULT,cycle:config.CYCLE=config.CYCLE.DAY,start:str=None,end:str=None):
+        """读取缓存的K线结构化数组，按日期升序，不转换成字符串
+
+        Args:
+            symbol (str): 证券代码
+            market (int): 市场代码
+            fq (str, optional): 复权类型. Defaults to config.FQ.DEFAULT.
+            cycle (config.CYCLE, optional): 周期. Defaults to config.CYCLE.DAY.
+            start (str, optional): 开始日期 YYYYMMDD. Defaults to None.
+            end (str, optional): 结束日期 YYYYMMDD. Defaults to None.
+
+        Returns:
+            numpy.ndarray: KLINE_DTYPE 数组，没有缓存返回None
+        """
+        source,factors = CacheHelper.kline_source(symbol,market,fq)
+        base = CacheHelper.kline_cycle(cycle)
+        records = KlineStore.read(CacheHelper.get_kline_filename(symbol,market,base,source))
+        if records is None: return
+        if base!=cycle: records,factors = CacheHelper.resample_klines(records,cycle,factors,fq),None
+        lo,hi = KlineStore.bounds(records,start,end)
+        if factors is not None: return KlineStore.adjust(records[lo:hi],factors,fq)
+        return numpy.array(records[lo:hi])
+
+    @staticmethod
+    def klines_cover(symbol:str,market:int,page:int=1,page_size:int=320,fq:str=config.FQ.DEFAULT,cycle:config.CYCLE=config.CYCLE.DAY,start:str=None) -> bool:
+        """不管缓存是否过期，缓存是否包含要求的页或者日期区间，
+        增量同步只补最新的K线，缓存本来就不够时要按原来的参数请求
+
+        Returns:
+            bool: 已经是上市以来的全部K线，或者K线数量够到要求的页，或者有开始日期之前的K线
+        """
+        source,factors = CacheHelper.kline_source(symbol,market,fq)
+        base = CacheHelper.kline_cycle(cycle)
+        filename = CacheHelper.get_kline_filename(symbol,market,base,source)
+        if not CacheManifest.get_instance().exists(filename): return False
+        if KlineStore.is_complete(filename): return True
+        records = KlineStore.read(filename)
+        if records is None or not len(records): return False
+        if start: return KlineStore.bounds(records,start)[0]>0
+        if base!=cycle: records = kline_resample.resample(records,cycle)
+        return len(records)>=page*page_size
+
+    @staticmethod
+    def get_klines(symbol:str,market:int,page:int=1,page_size:int=320,fq:str=config.FQ.DEFAULT,cycle:config.CYCLE=config.CYCLE.DAY,start:str=None,end:str=None,partial:bool=False):
+        """读取缓存的K线，时间倒序
+
+        Args:
+            partial (bool, optional): 缓存不够一页时也返回已有的部分，用于服务器已经返回之后重新读取. Defaults to False.
+
+        Returns:
+            list: K线字符串，缓存无效或者不够一页返回None
+        """
+        source,factors = CacheHelper.kline_source(symbol,market,fq)
+        base = CacheHelper.kline_cycle(cycle)
+        filename = CacheHelper.get_kline_filename(symbol,market,base,source)
+        if not CacheManifest.get_instance().exists(filename): return
         # 如果今天没有缓存过，就不使用缓存
-        if not end and not CacheHelper.today_is_cache_date(CacheHelper.get_db_path(cycle,fq,db)):return
+        if not end and not CacheHelper.today_is_cache_date(os.path.dirname(filename)):return
+        
+        records = KlineStore.read(filename)
+        if records is not None and len(records):
+            if base!=cycle: records,factors = CacheHelper.resample_klines(records,cycle,factors,fq),None
+            if start:
+                # 没有结束日期时取到最新
+                lo,hi = KlineStore.bounds(records,start,end)
+            else:
+                # 分页，时间倒序，第一页是最新的K线
+                hi = max(len(records)-(page-1)*page_size,0)
+                lo = max(hi-page_size,0)
+                # 缓存不够一页并且不是上市以来的全部K线时，重新请求
+                if hi-lo<page_size and not partial and not KlineStore.is_complete(filename): return
+            records = records[lo:hi]
+            # 只复权要返回的部分
+            if factors is not None: records = KlineStore.adjust(records,factors,fq)
+            # 时间倒序
+            return KlineStore.format(records[::-1])
+
+    @staticmethod
+    def kline_cycle(cycle:str) -> str:
+        """K线缓存的周期，开启本地合成时周、月、年读取日K线，5-60分钟读取1分钟K线
+        """
+        if config.KLINE_RESAMPLE: return kline_resample.base_cycle(cycle)
+        return cycle
+
+    @staticmethod
+    def resample_klines(records:numpy.ndarray,cycle:str,factors:numpy.ndarray=None,fq:str=None) -> numpy.ndarray:
+        """基础周期K线合成为指定周期，需要复权时先复权再合成
+        """
+        if factors is not None: records = KlineStore.adjust(records,factors,fq)
+        return kline_resample.resample(records,cycle)
+
+    @staticmethod
+    def local_fq(fq:str) -> bool:
+        """是否在本地计算复权，开启后只缓存不复权的K线和复权因子
+        """
+        return config.KLINE_LOCAL_FQ and fq in (config.FQ.QFQ,config.FQ.HFQ)
+
+    @staticmethod
+    def kline_source(symbol:str,market:int,fq:str):
+        """复权K线的缓存来源，本地复权并且复权因子缓存有效时读取不复权的K线，否则读取服务器复权的K线
+
+        Returns:
+            tuple: (读取的复权类型,复权因子)，不需要本地复权时复权因子为None
+        """
+        if CacheHelper.local_fq(fq):
+            factors = CacheHelper.get_factors_array(symbol,market)
+            if factors is not None: return config.FQ.DEFAULT,factors
+        return fq,None
+
+    @staticmethod
+    def adjust_klines(symbol:str,market:int,fq:str,datas:list) -> list:
+        """服务器返回的不复权K线用缓存的复权因子复权
+
+        Returns:
+            list: 复权后的K线字符串，时间倒序
+        """
+        records = KlineStore.adjust(KlineStore.parse(datas),CacheHelper.get_factors_array(symbol,market),fq)
+        return KlineStore.format(records[::-1])
+
+    @staticmethod
+    def save_factors(symbol:str,market:MARKET,datas:any):
+        if datas is None: return
+        db = "factors"
+        code = symbol if symbol[:2] in MARKET_VAL else MARKET_VAL[market]+symbol
+        filename = CacheHelper.get_db_filename(code,market,code,None,db)
+        CacheHelper.write_json(filename,datas)
+        CacheHelper.save_cache_date(CacheHelper.get_db_path(code,None,db))
+
+    @staticmethod
+    def get_factors(symbol:str,market:int):
+        """读取缓存的复权因子，缓存无效时返回None
+        """
+        db = "factors"
+        code = symbol if symbol[:2] in MARKET_VAL else MARKET_VAL[market]+symbol
+        path = CacheHelper.get_db_path(code,None,db)
+        if not CacheHelper.today_is_cache_date(path): return
+        filename = CacheHelper.get_db_filename(code,market,code,None,db)
+        if not CacheManifest.get_instance().exists(filename): return
+        datas = CacheHelper.read_json(filename)
+        # 没有除权除息时也是有效的缓存
+        return {} if datas is None else datas
+
+    @staticmethod
+    def get_factors_array(symbol:str,market:int) -> numpy.ndarray:
+        """读取缓存的复权因子
+
+        Returns:
+            numpy.ndarray: FACTOR_DTYPE 数组，缓存无效时返回None
+        """
+        datas = CacheHelper.get_factors(symbol,market)
+        if datas is None: return
+        return KlineStore.parse_factors(datas)
         
-        with open(filename,mode="r",encoding=CacheHelper.encoding) as f:
-            content = f.read()
-            if content:
-                content = json.loads(content)
-                if isinstance(content,dict):
-                    content = dict(sorted(content.items(), key=lambda x: x[0]))
-                    datas = list(content.values())
-                    # 分页
-                    s = (page-1)*page_size
-                    e = page * page_size
-                    # 时间倒序
-                    datas.reverse()
-                    if e >=datas.__len__(): e = datas.__len__()
-                    
-                    if start and not end:
-                        end = datetime.datetime.strftime("%Y%m%d")
-                    
-                    if start and end:
-                        s = -1
-                        e = -1
-                        for i in range(len(datas)):
-                            item = datas[i]
-                            if isinstance(item,list):
-                                d = item[0][:8]
-                            else:
-                                d = item.split(",")[0][:8]
-                            if int(d)==int(end):
-                                s = i
-                                break
-                            if int(d)<int(end):
-                                break 
-
-                        for i in range(len(datas)-1,0,-1):
-                            item = datas[i]
-                            if isinstance(item,list):
-                                d = item[0][:8]
-                            else:
-                                d = item.split(",")[0][:8]
-                            if int(d)>=int(start):
-                                e = i
-                                break
-                        if s>=0 and e>=0:
-                            datas = datas[s:e]
-                        else:
-                            datas = []
-                    else:
-                        datas = datas[s:e]
-                    return datas
-                
     @staticmethod
     def save_finance(symbol:str,market:MARKET,report_type:str,date:str,datas:any):
+        if datas and config.CACHE_BACKEND=="sqlite":
+            return SqliteCache.get_instance().save("finance",symbol,market,report_type,date,datas)
         if datas:
             db = "finance"
             if not date:
@@ -157,19 +307,19 @@ class CacheHelper:
             if report_type:
                 dir2 = report_type+"/"+date.replace("-","")
             filename = CacheHelper.get_db_filename(symbol,market,symbol,dir2,db)
-            with open(filename,mode="w",encoding=CacheHelper.encoding) as f:
-                f.write(json.dumps(datas))
+            CacheHelper.write_json(filename,datas)
             CacheHelper.save_cache_date(CacheHelper.get_db_path(symbol,report_type,db))
     
     @staticmethod
     def get_finance(symbol:str,market:int,report_type:config.REPORT_TYPE=config.REPORT_TYPE.DEFAULT,report_date="",start:str=None,end:str=None):
+        if config.CACHE_BACKEND=="sqlite":
+            return CacheHelper.query_cache("finance",symbol,market,report_type,report_date,start,end)
         db = "finance"
         path = CacheHelper.get_db_path(symbol,report_type,db)
         # 如果今天没有缓存过，就不使用缓存
         if not report_date and not CacheHelper.today_is_cache_date(path):return
-        dir_list:list = os.listdir(path)
+        dir_list:list = CacheManifest.get_instance().listdir(path)
         if not dir_list: return []
-        if "last_date.txt" in dir_list: dir_list.remove("last_date.txt")
         dir_list.sort()
         if report_date=="":report_date = dir_list[-1]
         if not report_date : return []
@@ -179,48 +329,43 @@ class CacheHelper:
             dir2 = report_type+"/"+report_date
         if not start and not end:
             filename = CacheHelper.get_db_filename(symbol,market,symbol,dir2,db)
-            if not os.path.exists(filename): return
-            with open(filename,mode="r",encoding=CacheHelper.encoding) as f:
-                content = f.read()
-                if content:
-                    content = json.loads(content)
-                    return content
+            if not CacheManifest.get_instance().exists(filename): return
+            return CacheHelper.read_json(filename)
         else:
             result = []
             if start==None: return result
-            if end==None:end = datetime.datetime.strftime("%Y%m%d")
+            if end==None:end = datetime.datetime.now().strftime("%Y%m%d")
             start = start.replace("-","")
             end = end.replace("-","")
             for date in dir_list:
                 if int(date)>=int(start) and int(date)<=int(end):
                     filename = CacheHelper.get_db_filename(symbol,market,symbol,dir2,db)
-                    if not os.path.exists(filename): return
-                    with open(filename,mode="r",encoding=CacheHelper.encoding) as f:
-                        content = f.read()
-                        if content:
-                            content = json.loads(content)
-                            result.append(content)
+                    if not CacheManifest.get_instance().exists(filename): return
+                    content = CacheHelper.read_json(filename)
+                    if content is not None: result.append(content)
             return result
     
     @staticmethod
     def save_structure(symbol:str,market:MARKET,date:str,datas:any):
+        if datas and config.CACHE_BACKEND=="sqlite":
+            return SqliteCache.get_instance().save("structure",symbol,market,None,date,datas)
         if datas:
             db = "structure"
             dir2 = date.replace("-","")
             filename = CacheHelper.get_db_filename(symbol,market,symbol,dir2,db)
-            with open(filename,mode="w",encoding=CacheHelper.encoding) as f:
-                f.write(json.dumps(datas))
+            CacheHelper.write_json(filename,datas)
             CacheHelper.save_cache_date(CacheHelper.get_db_path(symbol,None,db))
     
     @staticmethod
     def get_structure(symbol:str,market:int,start:str=None,end:str=None):
+        if config.CACHE_BACKEND=="sqlite":
+            return CacheHelper.query_cache("structure",symbol,market,None,None,start,end)
         db = "structure"
         path = CacheHelper.get_db_path(symbol,None,db)
         # 如果今天没有缓存过，就不使用缓存
         if not end and not CacheHelper.today_is_cache_date(path):return
-        dir_list:list = os.listdir(path)
+        dir_list:list = CacheManifest.get_instance().listdir(path)
         if not dir_list: return []
-        if "last_date.txt" in dir_list: dir_list.remove("last_date.txt")
         dir_list.sort()
         date = ""
         if date=="":date = dir_list[-1]
@@ -229,49 +374,44 @@ class CacheHelper:
         dir2 = date
         if not start and not end:
             filename = CacheHelper.get_db_filename(symbol,market,symbol,dir2,db)
-            if not os.path.exists(filename): return
-            with open(filename,mode="r",encoding=CacheHelper.encoding) as f:
-                content = f.read()
-                if content:
-                    content = json.loads(content)
-                    return content
+            if not CacheManifest.get_instance().exists(filename): return
+            return CacheHelper.read_json(filename)
         else:
             result = []
             if start==None: return result
-            if end==None:end = datetime.datetime.strftime("%Y%m%d")
+            if end==None:end = datetime.datetime.now().strftime("%Y%m%d")
             start = start.replace("-","")
             end = end.replace("-","")
             for date in dir_list:
                 if int(date)>=int(start) and int(date)<=int(end):
                     filename = CacheHelper.get_db_filename(symbol,market,symbol,dir2,db)
-                    if not os.path.exists(filename): return
-                    with open(filename,mode="r",encoding=CacheHelper.encoding) as f:
-                        content = f.read()
-                        if content:
-                            content = json.loads(content)
-                            result.append(content)
+                    if not CacheManifest.get_instance().exists(filename): return
+                    content = CacheHelper.read_json(filename)
+                    if content is not None: result.append(content)
             return result
     
     @staticmethod
     def save_sharebonus(symbol:str,market:MARKET,date:str,datas:any):
+        if datas and config.CACHE_BACKEND=="sqlite":
+            return SqliteCache.get_instance().save("sharebonus",symbol,market,None,date,datas)
         if datas:
             db = "sharebonus"
             dir2 = date.replace("-","")
             filename = CacheHelper.get_db_filename(symbol,market,symbol,dir2,db)
-            with open(filename,mode="w",encoding=CacheHelper.encoding) as f:
-                f.write(json.dumps(datas))
+            CacheHelper.write_json(filename,datas)
             CacheHelper.save_cache_date(CacheHelper.get_db_path(symbol,None,db))
     
     @staticmethod
     def get_sharebonus(symbol:str,market:int,start:str=None,end:str=None):
+        if config.CACHE_BACKEND=="sqlite":
+            return CacheHelper.query_cache("sharebonus",symbol,market,None,None,start,end)
         db = "sharebonus"
         path = CacheHelper.get_db_path(symbol,None,db)
         # 如果今天没有缓存过，就不使用缓存
-        if not date and not CacheHelper.today_is_cache_date(path):return
+        if not end and not CacheHelper.today_is_cache_date(path):return
 
-        dir_list:list = os.listdir(path)
+        dir_list:list = CacheManifest.get_instance().listdir(path)
         if not dir_list: return []
-        if "last_date.txt" in dir_list: dir_list.remove("last_date.txt")
         dir_list.sort()
         date = ""
         if date=="":date = dir_list[-1]
@@ -280,37 +420,66 @@ class CacheHelper:
         dir2 = date
         if not start and not end:
             filename = CacheHelper.get_db_filename(symbol,market,symbol,dir2,db)
-            if not os.path.exists(filename): return
-            with open(filename,mode="r",encoding=CacheHelper.encoding) as f:
-                content = f.read()
-                if content:
-                    content = json.loads(content)
-                    return content
+            if not CacheManifest.get_instance().exists(filename): return
+            return CacheHelper.read_json(filename)
         else:
             result = []
             if start==None: return result
-            if end==None:end = datetime.datetime.strftime("%Y%m%d")
+            if end==None:end = datetime.datetime.now().strftime("%Y%m%d")
             start = start.replace("-","")
             end = end.replace("-","")
             for date in dir_list:
                 if int(date)>=int(start) and int(date)<=int(end):
                     filename = CacheHelper.get_db_filename(symbol,market,symbol,dir2,db)
-                    if not os.path.exists(filename): return
-                    with open(filename,mode="r",encoding=CacheHelper.encoding) as f:
-                        content = f.read()
-                        if content:
-                            content = json.loads(content)
-                            result.append(content)
+                    if not CacheManifest.get_instance().exists(filename): return
+                    content = CacheHelper.read_json(filename)
+                    if content is not None: result.append(content)
             return result
     
+    @staticmethod
+    def query_cache(table:str,symbol:str,market:int,report_type:str=None,date:str=None,start:str=None,end:str=None):
+        """从 sqlite 读取缓存，和文件缓存的返回一致
+
+        Args:
+            table (str): finance/structure/sharebonus
+            date (str, optional): 报告日期，为空时取最新的一条. Defaults to None.
+
+        Returns:
+            any: 没有区间时返回一条数据，有区间时返回数据数组
+        """
+        cache = SqliteCache.get_instance()
+        # 如果今天没有缓存过，就不使用缓存
+        if not date and not end and not cache.is_fresh(table,symbol,market,report_type):return
+        if not start and not end:
+            return cache.get(table,symbol,market,report_type,date)
+        if start==None: return []
+        if end==None:end = datetime.datetime.now().strftime("%Y%m%d")
+        return [item["data"] for item in cache.query(table,symbol,market,report_type,start,end)]
+
+    @staticmethod
+    def query(table:str,symbol:str=None,market:int=None,report_type:str=None,start:str=None,end:str=None) -> list:
+        """按日期区间查询财务、股本结构、分红配送缓存，不指定证券时查询全市场，需要 config.CACHE_BACKEND = "sqlite"
+
+        Args:
+            table (str): finance/structure/sharebonus
+            symbol (str, optional): 证券代码. Defaults to None.
+            market (int, optional): 市场编号. Defaults to None.
+            report_type (str, optional): 报表类型. Defaults to None.
+            start (str, optional): 开始日期，包含. Defaults to None.
+            end (str, optional): 结束日期，包含. Defaults to None.
+
+        Returns:
+            list: [{"symbol","market","report_type","date","data"},...]
+        """
+        return SqliteCache.get_instance().query(table,symbol,market,report_type,start,end)
+
     @staticmethod
     def save_timesharing(symbol:str,market:MARKET,date:str,datas:any):
         if datas:
             db = "timesharing"
             dir2 = date.replace("-","")
             filename = CacheHelper.get_db_filename(symbol,market,symbol,dir2,db)
-            with open(filename,mode="w",encoding=CacheHelper.encoding) as f:
-                f.write(json.dumps(datas))
+            CacheHelper.write_json(filename,datas)
             CacheHelper.save_cache_date(CacheHelper.get_db_path(symbol,None,db))
     
     @staticmethod
@@ -320,56 +489,108 @@ class CacheHelper:
         # 如果今天没有缓存过，就不使用缓存
         if not date and not CacheHelper.today_is_cache_date(path):return
 
-        dir_list:list = os.listdir(path)
+        dir_list:list = CacheManifest.get_instance().listdir(path)
         if not dir_list: return []
-        if "last_date.txt" in dir_list: dir_list.remove("last_date.txt")
         dir_list.sort()
         if not date:date = dir_list[-1]
         if not date : return []
         date = date.replace("-","")
         dir2 = date
         filename = CacheHelper.get_db_filename(symbol,market,symbol,dir2,db)
-        if not os.path.exists(filename): return
-        with open(filename,mode="r",encoding=CacheHelper.encoding) as f:
-            content = f.read()
-            if content:
-                content = json.loads(content)
-                return content
+        if not CacheManifest.get_instance().exists(filename): return
+        return CacheHelper.read_json(filename)
     
+    @staticmethod
+    def get_translist_filename(symbol:str,market:MARKET,date:str):
+        """逐笔交易缓存文件，每个证券每个交易日一个文件
+        """
+        db = "translist"
+        code = symbol if symbol[:2] in MARKET_VAL else MARKET_VAL[market]+symbol
+        return CacheHelper.get_db_path(code,None,db)+date.replace("-","")+TickStore.suffix
+
     @staticmethod
     def save_translist(symbol:str,market:MARKET,date:str,datas:any,page:int=1,page_size:int=10):
-        if datas:
-            db = "translist"
-            dir2 = date.replace("-","")
-            dir2 += "/%s-%s" % (page,page_size)
-            filename = CacheHelper.get_db_filename(symbol,market,symbol,dir2,db)
-            with open(filename,mode="w",encoding=CacheHelper.encoding) as f:
-                f.write(json.dumps(datas))
-            CacheHelper.save_cache_date(os.path.dirname(filename))
-    
+        """保存逐笔交易，和缓存中的同一天数据合并成一个完整序列
+
+        Args:
+            date (str): 交易日期
+            datas (any): 服务器返回的第 page 页，时间倒序
+            page (int, optional): 页码. Defaults to 1.
+            page_size (int, optional): 每页大小，返回的数量少于每页大小说明已经到当天第一笔. Defaults to 10.
+        """
+        if datas is None: return
+        filename = CacheHelper.get_translist_filename(symbol,market,date)
+        columns,kind = TickStore.parse(datas)
+        complete = len(datas)<page_size
+        refreshed = datetime.datetime.now().strftime("%Y%m%d%H%M")
+        cache = TickStore.read(filename) if CacheManifest.get_instance().exists(filename) else None
+        if page>1:
+            # 更早的一页，只有和缓存开头相接时才补到前面，不能确定和最新数据相接的不缓存
+            if not cache or cache["complete"] or len(cache["columns"])!=len(columns): return
+            old = cache["columns"]
+            count = len(old[0]) if old else 0
+            if (page-1)*page_size>count: return
+            keep = len(datas)-(count-(page-1)*page_size)
+            columns = TickStore.concat([c[:max(keep,0)] for c in columns],old)
+            refreshed = cache["refreshed"]
+        elif cache and len(cache["columns"])==len(columns):
+            # 最新的一页，和缓存末尾重叠时只追加新的逐笔，没有重叠时替换
+            length = TickStore.overlap(cache["columns"],columns)
+            if length>=0:
+                columns = TickStore.concat(cache["columns"],columns,length)
+                complete = complete or cache["complete"]
+        TickStore.write(filename,columns,kind,complete,refreshed)
+        CacheManifest.get_instance().add(filename)
+
     @staticmethod
-    def get_translist(symbol:str,market:int,date:str=None,page:int=1,page_size:int=10):
-        db = "translist"
-        path = CacheHelper.get_db_path(symbol,None,db)
-        dir_list:list = os.listdir(path)
-        if not dir_list: return []
-        dir_list.sort()
-        if not date:date = dir_list[-1]
-        if not date : return []
-        date = date.replace("-","")
-        dir2 = date
-        dir2 += "/%s-%s" % (page,page_size)
-        filename = CacheHelper.get_db_filename(symbol,market,symbol,dir2,db)
-        # 如果今天没有缓存过，就不使用缓存
-        if not date and not CacheHelper.today_is_cache_date(os.path.dirname(filename)):return
-
-        if not os.path.exists(filename): return
-        with open(filename,mode="r",encoding=CacheHelper.encoding) as f:
-            content = f.read()
-            if content:
-                datas:list = json.loads(content)
-                # datas.reverse()
-                # start = (page-1) * page_size
-                # end = page * page_size
-                # datas = datas[start:end]
-                return datas
\ No newline at end of file
+    def get_translist_cache(symbol:str,market:int,date:str=None,fresh:bool=True) -> dict:
+        """读取一天的逐笔交易缓存
+
+        Args:
+            date (str, optional): 交易日期. Defaults to 当前交易日.
+            fresh (bool, optional): 是否只返回不会再变化的缓存，当天盘中的数据需要重新同步. Defaults to True.
+
+        Returns:
+            dict: TickStore.read 的结果，没有缓存返回None
+        """
+        date = (date or TradeCalendar.get_instance().trade_date()).replace("-","")
+        filename = CacheHelper.get_translist_filename(symbol,market,date)
+        if not CacheManifest.get_instance().exists(filename): return
+        cache = TickStore.read(filename)
+        if cache is None: return
+        # 收盘后刷新过的完整数据不会再变化
+        if fresh and not (cache["complete"] and cache["refreshed"]>=date+SESSION_CLOSE): return
+        return cache
+
+    @staticmethod
+    def get_translist(symbol:str,market:int,date:str=None,page:int=1,page_size:int=10,fresh:bool=True):
+        """从一天的完整逐笔序列中按页读取，时间倒序
+
+        Returns:
+            list: 逐笔交易，缓存不够或者需要重新同步返回None
+        """
+        cache = CacheHelper.get_translist_cache(symbol,market,date,fresh)
+        if cache is None: return
+        columns = cache["columns"]
+        count = len(columns[0]) if columns else 0
+        hi = count-(page-1)*page_size
+        lo = max(hi-page_size,0)
+        return TickStore.format(columns,cache["kind"],lo,max(hi,0))
+
+    @staticmethod
+    def get_translist_range(symbol:str,market:int,date:str=None,start:int=None,end:int=None):
+        """按时间段读取逐笔交易，时间倒序
+
+        Args:
+            start (int, optional): 开始时间，和第一个字段的格式相同，例如 930，包含. Defaults to None.
+            end (int, optional): 结束时间，包含. Defaults to None.
+
+        Returns:
+            list: 逐笔交易，没有缓存返回None
+        """
+        cache = CacheHelper.get_translist_cache(symbol,market,date,False)
+        if cache is None or not cache["columns"]: return
+        times = cache["columns"][0]
+        lo = 0 if start is None else int(numpy.searchsorted(times,start,side="left"))
+        hi = len(times) if end is None else int(numpy.searchsorted(times,end,side="right"))
+        return TickStore.format(cache["columns"],cache["kind"],lo,hi)
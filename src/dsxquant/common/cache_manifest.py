@@ -0,0 +1,236 @@
+"""缓存目录的元数据清单
+目录是否存在、目录下有哪些日期和文件、最后缓存日期都保存在内存里，
+启动时从 CACHE_PATH/manifest.json 读取一次，写缓存时同步更新并定时合并后原子写回，
+查询缓存时不再每次 os.path.exists、os.listdir、读取 last_date.txt，
+只按修改时间定时检查其他进程的变化，清单里没有的文件再确认一次
+"""
+import atexit
+import bisect
+import os
+import threading
+import time
+from dsxquant.config import config
+from dsxquant.common import codec
+
+
+class CacheManifest(object):
+
+    _instances = {}
+    _lock = threading.Lock()
+    # 最后缓存日期文件
+    date_filename = "last_date.txt"
+
+    def __init__(self,path:str) -> None:
+        self.path = os.path.normpath(path)
+        self.filename = os.path.join(self.path,"manifest.json")
+        self.lock = threading.RLock()
+        # 本进程已经确认存在的目录
+        self.dirs = set()
+        # 目录的最后缓存时间 {相对路径:YYYYMMDDHHMM}
+        self.refreshed = {}
+        # 目录下的文件和子目录，按名称排序 {相对路径:[名称,...]}
+        self.listing = {}
+        # 读取清单时目录的修改时间，目录变化说明其他进程增删过文件 {相对路径:修改时间}
+        self.mtimes = {}
+        # 目录最后一次检查修改时间的时间，间隔 config.CACHE_MANIFEST_INTERVAL 秒检查一次
+        self.checked = {}
+        # 最后缓存日期文件的 (修改时间,检查时间)，只在本进程写入或者文件变化时重新读取
+        self.date_mtimes = {}
+        self.dirty = False
+        self.flush_time = time.time()
+        self.load()
+
+    @classmethod
+    def get_instance(cls):
+        """按 config.CACHE_PATH 取得实例
+        """
+        path = config.CACHE_PATH
+        with cls._lock:
+            instance = cls._instances.get(path)
+            if instance is None:
+                instance = cls._instances[path] = cls(path)
+            return instance
+
+    def __key(self,path:str) -> str:
+        return os.path.relpath(os.path.normpath(path),self.path)
+
+    def read(self) -> dict:
+        """读取磁盘上的清单
+
+        Returns:
+            dict: {"refreshed":{},"listing":{},"mtimes":{}}，不存在或者损坏返回空字典
+        """
+        if not os.path.exists(self.filename): return {}
+        try:
+            with open(self.filename,mode="rb") as f:
+                content = codec.loads(f.read())
+        except (ValueError,OSError):
+            return {}
+        return isinstance(content,dict) and content or {}
+
+    def load(self):
+        # 清单损坏时从磁盘重新建立
+        content = self.read()
+        self.refreshed = content.get("refreshed",{})
+        self.listing = content.get("listing",{})
+        self.mtimes = content.get("mtimes",{})
+
+    def merge(self,content:dict):
+        """合并其他进程写回的清单，最后缓存时间取较新的，目录清单取目录修改时间较新的
+        """
+        with self.lock:
+            for key,date in content.get("refreshed",{}).items():
+                if str(date).ljust(12,"0")>str(self.refreshed.get(key) or "").ljust(12,"0"):
+                    self.refreshed[key] = date
+            mtimes = content.get("mtimes",{})
+            for key,names in content.get("listing",{}).items():
+                if key not in self.listing or (mtimes.get(key) or 0)>(self.mtimes.get(key) or 0):
+                    self.listing[key] = names
+                    self.mtimes[key] = mtimes.get(key)
+
+    def flush(self,force:bool=False):
+        """原子写回清单，默认间隔 config.CACHE_MANIFEST_INTERVAL 秒以上才写，
+        写之前合并磁盘上的清单，多个进程共用缓存目录时不会互相覆盖
+        """
+        with self.lock:
+            if not self.dirty: return
+            if not force and time.time()-self.flush_time<config.CACHE_MANIFEST_INTERVAL: return
+            self.dirty = False
+            self.flush_time = time.time()
+        if not os.path.exists(self.path): return
+        self.merge(self.read())
+        with self.lock:
+            datas = codec.dumpb({"refreshed":self.refreshed,"listing":self.listing,"mtimes":self.mtimes})
+        tmp = "%s.%d.tmp" % (self.filename,os.getpid())
+        with open(tmp,mode="wb") as f:
+            f.write(datas)
+        os.replace(tmp,self.filename)
+
+    def reset(self):
+        with self.lock:
+            self.dirs = set()
+            self.refreshed = {}
+            self.listing = {}
+            self.mtimes = {}
+            self.checked = {}
+            self.date_mtimes = {}
+            self.dirty = False
+
+    def makedirs(self,path:str):
+        """目录不存在时创建，每个目录每个进程只检查一次
+        """
+        if path in self.dirs: return
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self.dirs.add(path)
+
+    def listdir(self,path:str) -> list:
+        """目录下的文件和子目录，按名称排序，不包含 last_date.txt
+        间隔 config.CACHE_MANIFEST_INTERVAL 秒检查一次目录的修改时间，变化时重新列出
+
+        Returns:
+            list: 名称数组，目录不存在返回空数组
+        """
+        key = self.__key(path)
+        now = time.time()
+        with self.lock:
+            names = self.listing.get(key)
+            if names is not None and now-self.checked.get(key,0)<config.CACHE_MANIFEST_INTERVAL: return list(names)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = None
+        with self.lock:
+            names = self.listing.get(key)
+            if names is None or mtime!=self.mtimes.get(key):
+                names = mtime is not None and sorted(os.listdir(path)) or []
+                if CacheManifest.date_filename in names: names.remove(CacheManifest.date_filename)
+                self.listing[key] = names
+                self.mtimes[key] = mtime
+                self.dirty = True
+            self.checked[key] = now
+            return list(names)
+
+    def exists(self,filename:str) -> bool:
+        filename = os.path.normpath(filename)
+        if os.path.basename(filename) in self.listdir(os.path.dirname(filename)): return True
+        # 清单里没有时再确认一次，其他进程可能刚写入
+        if not os.path.exists(filename): return False
+        self.add(filename)
+        return True
+
+    def add(self,filename:str):
+        """写入缓存文件后登记，上级目录的清单也一起更新
+        """
+        path = os.path.normpath(filename)
+        with self.lock:
+            while True:
+                parent = os.path.dirname(path)
+                if os.path.normpath(parent)==self.path or len(parent)<len(self.path): break
+                names = self.listing.get(self.__key(parent))
+                name = os.path.basename(path)
+                if names is not None:
+                    i = bisect.bisect_left(names,name)
+                    if i<len(names) and names[i]==name: break
+                    names.insert(i,name)
+                    self.dirty = True
+                path = parent
+        self.flush()
+
+    def remove(self,filename:str):
+        """删除缓存文件后登记
+        """
+        path = os.path.normpath(filename)
+        with self.lock:
+            names = self.listing.get(self.__key(os.path.dirname(path)))
+            name = os.path.basename(path)
+            if names is not None and name in names:
+                names.remove(name)
+                self.dirty = True
+
+    def get_refreshed(self,path:str) -> str:
+        """目录的最后缓存时间 YYYYMMDDHHMM，其他进程可能已经更新 last_date.txt，
+        间隔 config.CACHE_MANIFEST_INTERVAL 秒检查一次修改时间，变化时才重新读取
+        """
+        key = self.__key(path)
+        now = time.time()
+        with self.lock:
+            date = self.refreshed.get(key)
+            checked = self.date_mtimes.get(key)
+        if date and date[:8]==time.strftime("%Y%m%d"): return date
+        if checked and now-checked[1]<config.CACHE_MANIFEST_INTERVAL: return date
+        filename = os.path.join(path,CacheManifest.date_filename)
+        try:
+            mtime = os.path.getmtime(filename)
+        except OSError:
+            mtime = None
+        if mtime is not None and (not checked or checked[0]!=mtime):
+            with open(filename,mode="r",encoding="utf-8") as f:
+                date = f.read()
+            with self.lock:
+                if self.refreshed.get(key)!=date:
+                    self.refreshed[key] = date
+                    self.dirty = True
+        with self.lock:
+            self.date_mtimes[key] = (mtime,now)
+        return date
+
+    def set_refreshed(self,path:str,date:str):
+        key = self.__key(path)
+        if self.refreshed.get(key)==date: return
+        filename = os.path.join(path,CacheManifest.date_filename)
+        with open(filename,mode="w",encoding="utf-8") as f:
+            f.write(date)
+        with self.lock:
+            self.refreshed[key] = date
+            self.date_mtimes[key] = (os.path.getmtime(filename),time.time())
+            self.dirty = True
+        self.flush()
+
+@atexit.register
+def _flush_all():
+    for instance in list(CacheManifest._instances.values()):
+        try:
+            instance.flush(True)
+        except OSError:
+            pass
@@ -0,0 +1,87 @@
+"""JSON 编解码
+通信协议和缓存文件统一使用这里的编解码方法，
+按 config.JSON_CODEC 选择 orjson/ujson 等更快的库，没有安装时使用标准库 json
+"""
+import json
+from dsxquant.config import config
+from dsxquant.config.logconfig import logger
+
+
+class JsonCodec(object):
+    def __init__(self,name:str,loads,dumpb,memoryview_ok:bool=False) -> None:
+        self.name = name
+        self.__loads = loads
+        self.__dumpb = dumpb
+        # 是否可以直接解析 memoryview
+        self.memoryview_ok = memoryview_ok
+
+    def loads(self,data):
+        """解析json，支持 str/bytes/bytearray/memoryview，直接从字节解析不再先解码成字符串
+        """
+        if isinstance(data,memoryview) and not self.memoryview_ok:
+            data = bytes(data)
+        try:
+            return self.__loads(data)
+        except ValueError:
+            if self.name=="json": raise
+            # 第三方库不支持的格式(例如 NaN)，交给标准库
+            if isinstance(data,memoryview): data = bytes(data)
+            return json.loads(data)
+
+    def dumpb(self,obj) -> bytes:
+        """序列化为utf-8字节
+        """
+        return self.__dumpb(obj)
+
+    def dumps(self,obj) -> str:
+        """序列化为字符串
+        """
+        return self.dumpb(obj).decode('utf-8')
+
+
+def _orjson():
+    import orjson
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    return JsonCodec("orjson",orjson.loads,lambda obj:orjson.dumps(obj,option=option),True)
+
+def _ujson():
+    import ujson
+    return JsonCodec("ujson",ujson.loads,lambda obj:ujson.dumps(obj,ensure_ascii=False).encode('utf-8'))
+
+def _json():
+    return JsonCodec("json",json.loads,lambda obj:json.dumps(obj,ensure_ascii=False).encode('utf-8'))
+
+_codecs = {"orjson":_orjson,"ujson":_ujson,"json":_json}
+_codec:JsonCodec = None
+
+def set_codec(name:str="auto") -> JsonCodec:
+    """选择编解码库
+
+    Args:
+        name (str, optional): auto/orjson/ujson/json，auto 按 orjson、ujson、json 的顺序选择第一个可用的. Defaults to "auto".
+
+    Returns:
+        JsonCodec: 编解码器
+    """
+    global _codec
+    names = name=="auto" and ["orjson","ujson","json"] or [name,"json"]
+    for item in names:
+        try:
+            _codec = _codecs[item]()
+            break
+        except (ImportError,KeyError):
+            if name!="auto": logger.warning("%s is not available, fallback to json" % item)
+    return _codec
+
+def get_codec() -> JsonCodec:
+    if _codec is None: set_codec(config.JSON_CODEC)
+    return _codec
+
+def loads(data):
+    return get_codec().loads(data)
+
+def dumpb(obj) -> bytes:
+    return get_codec().dumpb(obj)
+
+def dumps(obj) -> str:
+    return get_codec().dumps(obj)
@@ -1,4 +1,4 @@
-import json
+from dsxquant.common import codec
 from typing import Callable, TypeVar
 
 T = TypeVar("T")
@@ -7,7 +7,7 @@ class Json2Model:
     def __init__(self,jsonstr):
         try:
             if type(jsonstr)==str:
-                self.json = json.loads(jsonstr)
+                self.json = codec.loads(jsonstr)
             else:
                 self.json = jsonstr
         except Exception as ex:
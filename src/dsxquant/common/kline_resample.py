@@ -0,0 +1,102 @@
+"""K线周期合成
+周、月、年K线由日K线合成，5、15、30、60分钟K线由1分钟K线合成，
+每个证券只需要下载和缓存日K线、1分钟K线，合成的周期和基础数据始终一致
+"""
+import numpy
+from dsxquant.config.config import CYCLE
+from dsxquant.common.kline_store import KLINE_DTYPE
+
+# 合成周期 -> 基础周期
+RESAMPLE_BASE = {
+    CYCLE.WEEK:CYCLE.DAY,
+    CYCLE.MONTH:CYCLE.DAY,
+    CYCLE.YEAR:CYCLE.DAY,
+    CYCLE.M5:CYCLE.M1,
+    CYCLE.M15:CYCLE.M1,
+    CYCLE.M30:CYCLE.M1,
+    CYCLE.M60:CYCLE.M1,
+}
+# 每根合成K线大约包含的基础K线数量，用于换算请求数量
+RESAMPLE_RATIO = {
+    CYCLE.WEEK:5,
+    CYCLE.MONTH:23,
+    CYCLE.YEAR:250,
+    CYCLE.M5:5,
+    CYCLE.M15:15,
+    CYCLE.M30:30,
+    CYCLE.M60:60,
+}
+# A股上午 9:30-11:30 下午 13:00-15:00，分钟K线按结束时间标记，例如 0931 为第一根
+MORNING_OPEN = 9*60+30
+AFTERNOON_OPEN = 13*60
+SESSION_MINUTES = 120
+
+
+def base_cycle(cycle:str) -> str:
+    """周期的基础周期，不需要合成时返回本身
+    """
+    return RESAMPLE_BASE.get(cycle,cycle)
+
+
+def _days(dates:numpy.ndarray) -> numpy.ndarray:
+    """YYYYMMDD 整数转成 1970-01-01 以来的天数
+    """
+    years = (dates//10000-1970).astype("datetime64[Y]")
+    months = years.astype("datetime64[M]")+(dates//100%100-1)
+    return (months.astype("datetime64[D]")+(dates%100-1)).astype(numpy.int64)
+
+
+def _minute_keys(dates:numpy.ndarray,minutes:int) -> numpy.ndarray:
+    """分钟K线的分组标记，按交易时段切分，11:30 和 15:00 收盘的K线不跨越午休
+
+    Returns:
+        numpy.ndarray: 每根K线所属合成K线的日期 YYYYMMDDHHMM
+    """
+    days = dates//10000
+    hm = dates%10000
+    t = hm//100*60+hm%100
+    # 当天第几根1分钟K线 1-240，集合竞价和午休的K线归入相邻的K线
+    index = numpy.where(t<=MORNING_OPEN+SESSION_MINUTES,
+        numpy.clip(t-MORNING_OPEN,1,SESSION_MINUTES),
+        numpy.clip(t-AFTERNOON_OPEN,0,SESSION_MINUTES)+SESSION_MINUTES)
+    # 合成K线的最后一根
+    end = numpy.minimum(((index-1)//minutes+1)*minutes,SESSION_MINUTES*2)
+    end = numpy.where(end<=SESSION_MINUTES,MORNING_OPEN+end,AFTERNOON_OPEN+end-SESSION_MINUTES)
+    return days*10000+end//60*100+end%60
+
+
+def resample(records:numpy.ndarray,cycle:str) -> numpy.ndarray:
+    """合成K线，按整数日期计算分组后在连续分组上 reduceat，不逐行循环
+    周、月、年K线的日期为区间内最后一个交易日，分钟K线的日期为结束时间
+
+    Args:
+        records (numpy.ndarray): 按日期升序的基础周期 KLINE_DTYPE 数组
+        cycle (str): 合成周期 week/month/year/m5/m15/m30/m60
+
+    Returns:
+        numpy.ndarray: 合成后的 KLINE_DTYPE 数组
+    """
+    size = len(records)
+    if not size or cycle not in RESAMPLE_BASE: return numpy.array(records,dtype=KLINE_DTYPE)
+    dates = numpy.asarray(records["date"],dtype=numpy.int64)
+    labels = None
+    if cycle==CYCLE.WEEK:
+        # 1970-01-01 是星期四，按星期一开始分周
+        keys = (_days(dates)+3)//7
+    elif cycle==CYCLE.MONTH:
+        keys = dates//100
+    elif cycle==CYCLE.YEAR:
+        keys = dates//10000
+    else:
+        keys = labels = _minute_keys(dates,int(cycle[1:]))
+    starts = numpy.flatnonzero(numpy.r_[True,keys[1:]!=keys[:-1]])
+    ends = numpy.r_[starts[1:],size]-1
+    result = numpy.empty(len(starts),dtype=KLINE_DTYPE)
+    result["date"] = dates[ends] if labels is None else labels[starts]
+    result["open"] = records["open"][starts]
+    result["close"] = records["close"][ends]
+    result["high"] = numpy.fmax.reduceat(records["high"],starts)
+    result["low"] = numpy.fmin.reduceat(records["low"],starts)
+    result["volume"] = numpy.add.reduceat(records["volume"],starts)
+    result["amount"] = numpy.add.reduceat(records["amount"],starts)
+    return result
@@ -0,0 +1,298 @@
+"""K线列式二进制缓存
+每个证券每个周期每种复权一个文件，文件内容是按日期升序的定长记录，没有文件头，
+可以直接用 numpy.memmap(filename,dtype=KLINE_DTYPE,mode="r") 读取，
+旁边的 .idx 文件保存 [记录数,最后日期,是否完整]，追加写入时不用读取数据文件
+"""
+import bisect
+import os
+import numpy
+
+# K线字段，和服务器返回的 "日期,开,高,低,收,成交量,成交额" 顺序一致
+KLINE_FIELDS = ("date","open","high","low","close","volume","amount")
+# 日期为整数，例如 20230101 或者 202301010930
+KLINE_DTYPE = numpy.dtype([("date","<i8"),("open","<f8"),("high","<f8"),("low","<f8"),("close","<f8"),("volume","<f8"),("amount","<f8")])
+# 复权因子，除权日的 [前复权因子,后复权因子]
+FACTOR_DTYPE = numpy.dtype([("date","<i8"),("qfq","<f8"),("hfq","<f8")])
+# 复权时调整的价格字段
+PRICE_FIELDS = ("open","high","low","close")
+# 复权价格保留的小数位数，和服务器的复权K线一致
+PRICE_DECIMALS = 2
+
+
+def _date(value) -> int:
+    if isinstance(value,(int,numpy.integer)): return int(value)
+    return int("".join(c for c in str(value) if c.isdigit()))
+
+def _num(value:float) -> str:
+    if value!=value: return "nan"
+    if value.is_integer(): return str(int(value))
+    return repr(value)
+
+
+class KlineStore(object):
+
+    suffix = ".bin"
+    index_suffix = ".idx"
+
+    @staticmethod
+    def parse(datas:list) -> numpy.ndarray:
+        """服务器返回的K线转成结构化数组，按日期升序，日期重复时保留第一条
+
+        Args:
+            datas (list): ["日期,开,高,低,收,成交量,成交额",...] 或者 [[日期,开,...],...]
+
+        Returns:
+            numpy.ndarray: KLINE_DTYPE 数组
+        """
+        size = len(KLINE_FIELDS)
+        rows = []
+        for item in datas:
+            row = item.split(",") if isinstance(item,str) else list(item)
+            row = row[:size]
+            if len(row)<size: row += ["nan"]*(size-len(row))
+            rows.append(row)
+        records = numpy.empty(len(rows),dtype=KLINE_DTYPE)
+        if not rows: return records
+        columns = list(zip(*rows))
+        try:
+            records["date"] = numpy.array(columns[0],dtype=numpy.int64)
+        except (TypeError,ValueError):
+            # 日期带分隔符
+            records["date"] = [_date(d) for d in columns[0]]
+        for i,name in enumerate(KLINE_FIELDS[1:],1):
+            records[name] = numpy.array(columns[i],dtype=numpy.float64)
+        dates,index = numpy.unique(records["date"],return_index=True)
+        return records[index]
+
+    @staticmethod
+    def format(records:numpy.ndarray) -> list:
+        """结构化数组转回 "日期,开,高,低,收,成交量,成交额" 字符串
+
+        Args:
+            records (numpy.ndarray): KLINE_DTYPE 数组
+
+        Returns:
+            list: 字符串数组
+        """
+        return [",".join([str(row[0])]+[_num(v) for v in row[1:]]) for row in records.tolist()]
+
+    @staticmethod
+    def read(filename:str) -> numpy.ndarray:
+        """读取K线文件，使用 memmap 映射，不会一次读入内存
+
+        Args:
+            filename (str): 文件名
+
+        Returns:
+            numpy.ndarray: KLINE_DTYPE 数组，文件不存在返回None
+        """
+        try:
+            size = os.path.getsize(filename)//KLINE_DTYPE.itemsize
+        except OSError:
+            return
+        if size==0: return numpy.empty(0,dtype=KLINE_DTYPE)
+        return numpy.memmap(filename,dtype=KLINE_DTYPE,mode="r",shape=(size,))
+
+    @staticmethod
+    def write(filename:str,records:numpy.ndarray):
+        """整体写入K线文件，先写临时文件再替换，读的一方不会读到一半的文件
+        """
+        tmp = filename+".tmp"
+        with open(tmp,mode="wb") as f:
+            f.write(numpy.ascontiguousarray(records,dtype=KLINE_DTYPE).tobytes())
+        os.replace(tmp,filename)
+
+    @staticmethod
+    def tail(filename:str):
+        """读取尾部索引
+
+        Args:
+            filename (str): K线文件名
+
+        Returns:
+            tuple: (记录数,最后日期)，文件不存在或者为空返回 (0,None)
+        """
+        if not os.path.exists(filename): return 0,None
+        itemsize = KLINE_DTYPE.itemsize
+        count = os.path.getsize(filename)//itemsize
+        index_filename = filename+KlineStore.index_suffix
+        if os.path.exists(index_filename):
+            index = numpy.fromfile(index_filename,dtype=numpy.int64)
+            if len(index)>=2 and index[0]==count: return count,int(index[1])
+        if count==0: return 0,None
+        # 索引不存在或者和数据文件不一致，从最后一条记录重建
+        with open(filename,mode="rb") as f:
+            f.seek((count-1)*itemsize)
+            last = int(numpy.frombuffer(f.read(itemsize),dtype=KLINE_DTYPE)["date"][0])
+        KlineStore.write_tail(filename,count,last,False)
+        return count,last
+
+    @staticmethod
+    def write_tail(filename:str,count:int,last:int,complete:bool=None):
+        """写入尾部索引 [记录数,最后日期,是否完整]
+
+        Args:
+            complete (bool, optional): 是否已经包含上市以来的全部K线. Defaults to 保持原来的值.
+        """
+        if complete is None: complete = KlineStore.is_complete(filename)
+        tmp = filename+KlineStore.index_suffix+".tmp"
+        numpy.array([count,last,int(complete)],dtype=numpy.int64).tofile(tmp)
+        os.replace(tmp,filename+KlineStore.index_suffix)
+
+    @staticmethod
+    def is_complete(filename:str) -> bool:
+        """缓存是否已经包含上市以来的全部K线，不完整时缓存不够一页不能当作已经到头
+        """
+        try:
+            index = numpy.fromfile(filename+KlineStore.index_suffix,dtype=numpy.int64)
+        except (OSError,ValueError):
+            return False
+        return len(index)==3 and bool(index[2])
+
+    @staticmethod
+    def set_complete(filename:str):
+        count,last = KlineStore.tail(filename)
+        if last is not None: KlineStore.write_tail(filename,count,last,True)
+
+    @staticmethod
+    def append(filename:str,records:numpy.ndarray,overwrite_last:bool=False) -> int:
+        """追加写入K线，只写入比最后日期新的记录，写入量和新增的记录数成正比，
+        有早于最后日期且文件里没有的记录时才整体合并重写
+
+        Args:
+            filename (str): K线文件名
+            records (numpy.ndarray): 按日期升序的 KLINE_DTYPE 数组
+            overwrite_last (bool, optional): 用新数据覆盖最后一条记录，盘中缓存的最后一根K线可能还没有走完. Defaults to False.
+
+        Returns:
+            int: 写入后的记录数
+        """
+        count,last = KlineStore.tail(filename)
+        if not len(records): return count
+        if last is None:
+            KlineStore.write(filename,records)
+            KlineStore.write_tail(filename,len(records),int(records["date"][-1]),False)
+            return len(records)
+        dates = records["date"]
+        if overwrite_last and last in dates:
+            # 去掉最后一条记录，和新数据一起重新写入
+            count -= 1
+            last = -1
+            if count:
+                stored = KlineStore.read(filename)
+                last = int(stored["date"][count-1])
+                del stored
+        older = dates[dates<=last]
+        if len(older):
+            # 检查早于最后日期的记录是否都已经存在，二分查找只会读取少量页面
+            stored = KlineStore.read(filename)["date"]
+            pos = numpy.searchsorted(stored,older)
+            exists = (pos<count) & (stored[numpy.minimum(pos,count-1)]==older)
+            del stored
+            if not exists.all():
+                merged = KlineStore.merge(KlineStore.read(filename)[:count],records)
+                KlineStore.write(filename,merged)
+                KlineStore.write_tail(filename,len(merged),int(merged["date"][-1]))
+                return len(merged)
+        newer = records[dates>last]
+        if not len(newer): return count
+        itemsize = KLINE_DTYPE.itemsize
+        with open(filename,mode="r+b") as f:
+            # 截掉异常中断时写了一半的记录
+            f.truncate(count*itemsize)
+            f.seek(count*itemsize)
+            f.write(numpy.ascontiguousarray(newer,dtype=KLINE_DTYPE).tobytes())
+        count += len(newer)
+        KlineStore.write_tail(filename,count,int(newer["date"][-1]))
+        return count
+
+    @staticmethod
+    def merge(old:numpy.ndarray,new:numpy.ndarray) -> numpy.ndarray:
+        """合并K线，已有的日期保留原来的数据，只加入新的日期
+
+        Returns:
+            numpy.ndarray: 按日期升序的 KLINE_DTYPE 数组
+        """
+        if old is None or not len(old): return new
+        new = new[~numpy.isin(new["date"],old["date"])]
+        if not len(new): return numpy.array(old)
+        records = numpy.concatenate((old,new))
+        return records[numpy.argsort(records["date"],kind="stable")]
+
+    @staticmethod
+    def bounds(records:numpy.ndarray,start=None,end=None):
+        """二分查找日期区间，文件按日期升序保存，本身就是日期索引，
+        直接在映射的日期列上 bisect，只会读取少量页面，不用转换整列
+
+        Args:
+            records (numpy.ndarray): 按日期升序的 KLINE_DTYPE 数组
+            start (str, optional): 开始日期 YYYYMMDD，包含. Defaults to None.
+            end (str, optional): 结束日期 YYYYMMDD，包含. Defaults to None.
+
+        Returns:
+            tuple: (开始下标,结束下标)，records[开始下标:结束下标] 为区间内的K线
+        """
+        count = len(records)
+        if not count: return 0,0
+        dates = records["date"]
+        # 分钟K线的日期也按天比较，例如 202301010930 的天为 20230101
+        scale = 10**max(len(str(int(dates[0])))-8,0)
+        lo = 0
+        hi = count
+        if start: lo = bisect.bisect_left(dates,_date(start)*scale)
+        if end: hi = bisect.bisect_left(dates,(_date(end)+1)*scale,lo)
+        return lo,hi
+
+    @staticmethod
+    def parse_factors(datas) -> numpy.ndarray:
+        """服务器返回的复权因子转成结构化数组，按日期升序
+
+        Args:
+            datas (dict|list): {日期:"前复权因子,后复权因子"} 或者 {日期:[前复权因子,后复权因子]} 或者 ["日期,前复权因子,后复权因子",...]
+
+        Returns:
+            numpy.ndarray: FACTOR_DTYPE 数组
+        """
+        rows = []
+        if isinstance(datas,dict):
+            for date,item in datas.items():
+                item = item.split(",") if isinstance(item,str) else list(item)
+                rows.append((_date(date),float(item[0]),float(item[1])))
+        elif datas:
+            for item in datas:
+                item = item.split(",") if isinstance(item,str) else list(item)
+                rows.append((_date(item[0]),float(item[1]),float(item[2])))
+        factors = numpy.array(rows,dtype=FACTOR_DTYPE)
+        return factors[numpy.argsort(factors["date"],kind="stable")]
+
+    @staticmethod
+    def adjust(records:numpy.ndarray,factors:numpy.ndarray,fq:str) -> numpy.ndarray:
+        """用复权因子计算前复权、后复权K线，因子是按除权日分段的阶梯函数，
+        二分查找每根K线所在的区间后整列相乘，价格保留两位小数，成交量和成交额不变
+
+        除权日 d1<d2<...<dn，[d(k-1),dk) 区间内的K线前复权因子为 dk 的前复权因子，最后一个除权日之后为1，
+        后复权因子为 d(k-1) 的后复权因子，第一个除权日之前为1
+
+        Args:
+            records (numpy.ndarray): 不复权的 KLINE_DTYPE 数组
+            factors (numpy.ndarray): FACTOR_DTYPE 数组
+            fq (str): qfq/hfq
+
+        Returns:
+            numpy.ndarray: 复权后的新数组
+        """
+        result = numpy.array(records,dtype=KLINE_DTYPE)
+        if not len(result) or factors is None or not len(factors) or fq not in ("qfq","hfq"): return result
+        dates = result["date"]
+        # 分钟K线按天比较
+        scale = 10**max(len(str(int(dates[0])))-8,0)
+        # 每根K线之前(包含当天)的除权次数
+        pos = numpy.searchsorted(factors["date"],dates//scale,side="right")
+        if fq=="qfq":
+            steps = numpy.append(factors["qfq"],1.0)
+        else:
+            steps = numpy.insert(factors["hfq"],0,1.0)
+        ratio = steps[pos]
+        for name in PRICE_FIELDS:
+            result[name] = numpy.round(result[name]*ratio,PRICE_DECIMALS)
+        return result
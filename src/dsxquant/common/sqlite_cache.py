@@ -0,0 +1,170 @@
+"""财务、股本结构、分红配送的 SQLite 缓存
+所有证券保存在一个数据库文件里，每类数据一张表，主键为 (symbol,market,report_type,date)，
+按日期区间查询走索引，不再逐个打开小文件，config.CACHE_BACKEND = "sqlite" 时启用
+"""
+import datetime
+import os
+import sqlite3
+import threading
+from dsxquant.config import config
+from dsxquant.common import codec
+from dsxquant.common.trade_calendar import TradeCalendar
+
+# 支持的数据表
+TABLES = ("finance","structure","sharebonus")
+
+
+def _date(date) -> str:
+    return str(date).replace("-","")[:8]
+
+
+class SqliteCache(object):
+
+    _instances = {}
+    _lock = threading.Lock()
+
+    def __init__(self,filename:str) -> None:
+        self.filename = filename
+        # 每个线程一个连接
+        self.local = threading.local()
+        path = os.path.dirname(filename)
+        if path and not os.path.exists(path): os.makedirs(path)
+        self.__create()
+
+    @classmethod
+    def get_instance(cls,filename:str=None):
+        """按数据库文件取得实例，默认为 config.CACHE_SQLITE_FILE 或者 CACHE_PATH/cache.db
+        """
+        filename = filename or config.CACHE_SQLITE_FILE or config.CACHE_PATH+"/cache.db"
+        with cls._lock:
+            instance = cls._instances.get(filename)
+            if instance is None:
+                instance = cls._instances[filename] = cls(filename)
+            return instance
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self.local,"conn",None)
+        if conn is None:
+            conn = self.local.conn = sqlite3.connect(self.filename,timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def __create(self):
+        with self.conn as conn:
+            for table in TABLES:
+                conn.execute("""CREATE TABLE IF NOT EXISTS %s (
+                    symbol TEXT NOT NULL,
+                    market INTEGER NOT NULL,
+                    report_type TEXT NOT NULL DEFAULT '',
+                    date TEXT NOT NULL,
+                    data BLOB,
+                    PRIMARY KEY (symbol,market,report_type,date)
+                ) WITHOUT ROWID""" % table)
+                # 全市场按日期区间扫描
+                conn.execute("CREATE INDEX IF NOT EXISTS %s_date ON %s (report_type,date)" % (table,table))
+            # 最后缓存时间 YYYYMMDDHHMM，代替 last_date.txt
+            conn.execute("""CREATE TABLE IF NOT EXISTS cache_date (
+                name TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                market INTEGER NOT NULL,
+                report_type TEXT NOT NULL DEFAULT '',
+                date TEXT,
+                PRIMARY KEY (name,symbol,market,report_type)
+            ) WITHOUT ROWID""")
+
+    @staticmethod
+    def __key(symbol:str,market:int):
+        """去掉代码的市场前缀 sh000001 -> (000001,0)
+        """
+        if symbol and symbol[:2] in config.MARKET_VAL:
+            return symbol[2:],config.MARKET_VAL.index(symbol[:2])
+        return symbol,int(market or 0)
+
+    def save(self,table:str,symbol:str,market:int,report_type:str,date:str,datas:any):
+        """保存一条数据，同一个键重复保存时覆盖
+
+        Args:
+            table (str): finance/structure/sharebonus
+            symbol (str): 证券代码
+            market (int): 市场编号
+            report_type (str): 报表类型，不区分类型时为空
+            date (str): 报告日期 YYYYMMDD 或者 YYYY-MM-DD
+            datas (any): 数据
+        """
+        self.save_many(table,symbol,market,report_type,[(date,datas)])
+
+    def save_many(self,table:str,symbol:str,market:int,report_type:str,items:list):
+        """批量保存，一个事务提交
+
+        Args:
+            items (list): [(日期,数据),...]
+        """
+        symbol,market = self.__key(symbol,market)
+        report_type = report_type or ""
+        rows = [(symbol,market,report_type,_date(date),codec.dumpb(datas)) for date,datas in items if date and datas]
+        if not rows: return
+        today = datetime.datetime.now().strftime("%Y%m%d%H%M")
+        with self.conn as conn:
+            conn.executemany("INSERT OR REPLACE INTO %s (symbol,market,report_type,date,data) VALUES (?,?,?,?,?)" % table,rows)
+            conn.execute("INSERT OR REPLACE INTO cache_date (name,symbol,market,report_type,date) VALUES (?,?,?,?,?)",(table,symbol,market,report_type,today))
+
+    def is_fresh(self,table:str,symbol:str,market:int,report_type:str=None) -> bool:
+        """缓存是否有效，按交易日历判断是否包含最近一个已经收盘的交易时段
+        """
+        symbol,market = self.__key(symbol,market)
+        row = self.conn.execute("SELECT date FROM cache_date WHERE name=? AND symbol=? AND market=? AND report_type=?",(table,symbol,market,report_type or "")).fetchone()
+        return bool(row) and TradeCalendar.get_instance().is_fresh(row[0])
+
+    def get(self,table:str,symbol:str,market:int,report_type:str=None,date:str=None):
+        """读取一条数据
+
+        Args:
+            date (str, optional): 报告日期，为空时取最新的一条. Defaults to None.
+
+        Returns:
+            any: 数据，没有返回None
+        """
+        symbol,market = self.__key(symbol,market)
+        sql = "SELECT data FROM %s WHERE symbol=? AND market=? AND report_type=?" % table
+        params = [symbol,market,report_type or ""]
+        if date:
+            sql += " AND date=?"
+            params.append(_date(date))
+        else:
+            sql += " ORDER BY date DESC LIMIT 1"
+        row = self.conn.execute(sql,params).fetchone()
+        if row: return codec.loads(row[0])
+
+    def query(self,table:str,symbol:str=None,market:int=None,report_type:str=None,start:str=None,end:str=None) -> list:
+        """按日期区间查询，不指定证券时查询全市场
+
+        Args:
+            table (str): finance/structure/sharebonus
+            symbol (str, optional): 证券代码. Defaults to None.
+            market (int, optional): 市场编号. Defaults to None.
+            report_type (str, optional): 报表类型. Defaults to None.
+            start (str, optional): 开始日期，包含. Defaults to None.
+            end (str, optional): 结束日期，包含. Defaults to None.
+
+        Returns:
+            list: [{"symbol","market","report_type","date","data"},...] 按证券和日期升序
+        """
+        where = ["report_type=?"]
+        params = [report_type or ""]
+        if symbol:
+            symbol,market = self.__key(symbol,market)
+            where += ["symbol=?","market=?"]
+            params += [symbol,market]
+        elif market is not None:
+            where.append("market=?")
+            params.append(int(market))
+        if start:
+            where.append("date>=?")
+            params.append(_date(start))
+        if end:
+            where.append("date<=?")
+            params.append(_date(end))
+        sql = "SELECT symbol,market,report_type,date,data FROM %s WHERE %s ORDER BY symbol,market,date" % (table," AND ".join(where))
+        return [{"symbol":s,"market":m,"report_type":r,"date":d,"data":codec.loads(data)} for s,m,r,d,data in self.conn.execute(sql,params)]
@@ -0,0 +1,106 @@
+"""逐笔交易列式缓存
+每个证券每个交易日一个 .npz 文件，每个字段一列，按时间升序保存当天的完整逐笔序列，
+任意页码、每页大小或者时间段都从同一份数据切片，不再按页分别缓存
+"""
+import os
+import numpy
+
+
+def _value(value):
+    if isinstance(value,float) and value.is_integer(): return int(value)
+    return value
+
+
+class TickStore(object):
+
+    suffix = ".npz"
+
+    @staticmethod
+    def parse(datas:list):
+        """服务器返回的逐笔交易转成列，服务器按时间倒序返回，转成升序
+
+        Args:
+            datas (list): ["时间,价格,成交量,...",...] 或者 [[时间,价格,成交量,...],...]
+
+        Returns:
+            tuple: (列数组,行类型 str/list)
+        """
+        kind = "str" if datas and isinstance(datas[0],str) else "list"
+        rows = [item.split(",") if isinstance(item,str) else list(item) for item in reversed(datas)]
+        width = max((len(row) for row in rows),default=0)
+        columns = []
+        for i in range(width):
+            values = [row[i] if i<len(row) else None for row in rows]
+            try:
+                column = numpy.array(values,dtype=numpy.float64)
+            except (TypeError,ValueError):
+                # 买卖方向等非数值字段
+                column = numpy.array(["" if v is None else str(v) for v in values])
+            columns.append(column)
+        return columns,kind
+
+    @staticmethod
+    def format(columns:list,kind:str,lo:int,hi:int) -> list:
+        """取出升序下标 [lo,hi) 的逐笔交易，按时间倒序转回服务器的格式
+        """
+        if hi<=lo or not columns: return []
+        values = [column[lo:hi][::-1].tolist() for column in columns]
+        rows = [[_value(v) for v in row] for row in zip(*values)]
+        if kind=="str": return [",".join(str(v) for v in row) for row in rows]
+        return rows
+
+    @staticmethod
+    def read(filename:str) -> dict:
+        """读取逐笔交易缓存
+
+        Returns:
+            dict: {"columns":[列数组],"kind":行类型,"complete":是否包含当天第一笔,"refreshed":刷新时间}，文件不存在返回None
+        """
+        try:
+            with numpy.load(filename) as content:
+                count = int(content["count"])
+                return {
+                    "columns":[content["c%d" % i] for i in range(count)],
+                    "kind":str(content["kind"]),
+                    "complete":bool(content["complete"]),
+                    "refreshed":str(content["refreshed"]),
+                }
+        except (OSError,KeyError,ValueError):
+            return
+
+    @staticmethod
+    def write(filename:str,columns:list,kind:str,complete:bool,refreshed:str):
+        """整体写入，先写临时文件再替换
+        """
+        arrays = {"c%d" % i:column for i,column in enumerate(columns)}
+        tmp = filename+".tmp"
+        with open(tmp,mode="wb") as f:
+            numpy.savez(f,count=len(columns),kind=kind,complete=complete,refreshed=refreshed,**arrays)
+        os.replace(tmp,filename)
+
+    @staticmethod
+    def overlap(old:list,new:list) -> int:
+        """新数据开头和缓存末尾重叠的行数，逐笔交易没有编号，按整行比较，取最长的重叠
+
+        Returns:
+            int: 重叠行数，没有重叠返回-1
+        """
+        if not old or not new or len(old)!=len(new): return -1
+        size = len(old[0])
+        count = len(new[0])
+        if not size: return 0
+        # 缓存中和新数据第一行相同的位置
+        match = numpy.ones(size,dtype=bool)
+        for o,n in zip(old,new):
+            match &= o==n[0]
+        for i in numpy.flatnonzero(match):
+            length = min(size-i,count)
+            if all((o[i:i+length]==n[:length]).all() for o,n in zip(old,new)):
+                return length
+        return -1
+
+    @staticmethod
+    def concat(old:list,new:list,start:int=0) -> list:
+        """缓存末尾追加新数据，从新数据的 start 行开始
+        """
+        return [numpy.concatenate((o,n[start:])) for o,n in zip(old,new)]
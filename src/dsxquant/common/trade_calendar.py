@@ -0,0 +1,134 @@
+"""交易日历
+交易日从缓存的指数日K线得到，每根K线就是一个交易日，没有缓存或者晚于最后一根K线的日期按周一到周五估算，
+缓存是否有效按最近一个已经收盘的交易时段判断，周末、节假日和开盘前不再重复请求
+"""
+import bisect
+import datetime
+import os
+import threading
+import time
+from dsxquant.config import config
+from dsxquant.common.kline_store import KlineStore
+
+# 开盘集合竞价开始时间，之后当天的数据会变化
+SESSION_OPEN = "0915"
+# 收盘时间，之后当天的数据不再变化
+SESSION_CLOSE = "1500"
+
+
+class TradeCalendar(object):
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self) -> None:
+        # 交易日 YYYYMMDD 升序
+        self.days = []
+        self.filename = None
+        self.mtime = None
+        self.check_time = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def set_days(self,days:list):
+        """直接设置交易日
+
+        Args:
+            days (list): 交易日 YYYYMMDD
+        """
+        self.days = sorted(set(int(day) for day in days))
+
+    def load(self,filename:str=None):
+        """从指数日K线缓存读取交易日，文件变化时才重新读取，间隔 config.CALENDAR_RELOAD_INTERVAL 秒检查一次
+
+        Args:
+            filename (str, optional): K线文件. Defaults to config.CALENDAR_SYMBOL 的不复权日K线缓存.
+        """
+        if filename is None:
+            code = config.CALENDAR_SYMBOL
+            # 和 CacheHelper.get_kline_filename 的路径一致
+            filename = "%s/klines/%s/data/%s/%s%s" % (config.CACHE_PATH,config.CYCLE.DAY,code,code,KlineStore.suffix)
+        now = time.time()
+        if filename==self.filename and now-self.check_time<config.CALENDAR_RELOAD_INTERVAL: return
+        with self.lock:
+            if filename!=self.filename:
+                self.days = []
+                self.mtime = None
+            self.filename = filename
+            self.check_time = now
+            try:
+                mtime = os.path.getmtime(filename)
+            except OSError:
+                return
+            if mtime==self.mtime: return
+            self.mtime = mtime
+            records = KlineStore.read(filename)
+            if records is None or not len(records): return
+            dates = records["date"]
+            scale = 10**max(len(str(int(dates[0])))-8,0)
+            self.set_days((dates//scale).tolist())
+
+    def is_trading_day(self,day:int) -> bool:
+        """是否交易日
+
+        Args:
+            day (int): 日期 YYYYMMDD
+        """
+        self.load()
+        days = self.days
+        day = int(day)
+        if days and days[0]<=day<=days[-1]:
+            i = bisect.bisect_left(days,day)
+            return days[i]==day
+        return datetime.datetime.strptime(str(day),"%Y%m%d").weekday()<5
+
+    def previous_trading_day(self,day:int) -> int:
+        """前一个交易日，不包含当天
+        """
+        date = datetime.datetime.strptime(str(day),"%Y%m%d")
+        for _ in range(366):
+            date -= datetime.timedelta(days=1)
+            value = int(date.strftime("%Y%m%d"))
+            if self.is_trading_day(value): return value
+        return value
+
+    def trade_date(self,now:datetime.datetime=None) -> str:
+        """当前的交易日，交易日开盘后为当天，否则为上一个交易日
+
+        Returns:
+            str: YYYYMMDD
+        """
+        now = now or datetime.datetime.now()
+        today = int(now.strftime("%Y%m%d"))
+        if self.is_trading_day(today) and now.strftime("%H%M")>=SESSION_OPEN: return str(today)
+        return str(self.previous_trading_day(today))
+
+    def fresh_since(self,now:datetime.datetime=None) -> str:
+        """缓存需要在这个时间之后刷新过才有效
+        交易日盘中为当天开盘，收盘后为当天收盘，非交易日和开盘前为上一个交易日收盘
+
+        Returns:
+            str: YYYYMMDDHHMM
+        """
+        now = now or datetime.datetime.now()
+        today = int(now.strftime("%Y%m%d"))
+        hm = now.strftime("%H%M")
+        if self.is_trading_day(today):
+            if hm>=SESSION_CLOSE: return "%d%s" % (today,SESSION_CLOSE)
+            if hm>=SESSION_OPEN: return "%d%s" % (today,SESSION_OPEN)
+        return "%d%s" % (self.previous_trading_day(today),SESSION_CLOSE)
+
+    def is_fresh(self,refreshed:str,now:datetime.datetime=None) -> bool:
+        """缓存是否包含最近一个已经收盘的交易时段
+
+        Args:
+            refreshed (str): 缓存刷新时间 YYYYMMDDHHMM，旧版本只有日期 YYYYMMDD
+        """
+        if not refreshed: return False
+        return str(refreshed).ljust(12,"0")>=self.fresh_since(now)
@@ -102,8 +102,56 @@ PACK_TYPE = 'bi'
 HEADER_LEN = struct.calcsize(PACK_TYPE)
 # 是压缩传输数据
 ENABLE_GZIP = True
+# 请求压缩级别 1-9
+GZIP_LEVEL = 6
+# 请求包体小于该字节数不压缩
+GZIP_THRESHOLD = 512
+# 复用 zlib 压缩对象
+GZIP_REUSE = True
+# JSON编解码库 auto/orjson/ujson/json，auto 自动选择已安装的最快的库
+JSON_CODEC = "auto"
+# 发送队列长度，异步和多路复用模式下每个连接一个发送线程
+SEND_QUEUE_SIZE = 1024
+# 发送队列满时最多等待的秒数
+SEND_QUEUE_TIMEOUT = 5
+# 排队的小包合并发送的最大字节数
+SEND_COALESCE_SIZE = 64 * 1024
+# 订阅回调每个订阅最多积压的消息数，0 不限制
+DISPATCH_QUEUE_SIZE = 10000
+# 积压满时阻塞接收线程，False 则丢弃最早的消息
+DISPATCH_BLOCK = True
+# 接收缓冲区初始大小，收到大包时自动扩容并在连接内复用
+RECV_BUFFER_SIZE = 64 * 1024
 # 缓存地址
 CACHE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))+"/caches"
+# 财务、股本结构、分红配送的缓存方式 file=每条数据一个json文件 sqlite=单个数据库文件
+CACHE_BACKEND = "file"
+# sqlite 数据库文件，为空时使用 CACHE_PATH/cache.db
+CACHE_SQLITE_FILE = None
+# 缓存清单写回磁盘的最小间隔秒数，进程退出时也会写回
+CACHE_MANIFEST_INTERVAL = 5
+# K线缓存不是今天的时只请求最后缓存日期之后的K线，False 则重新请求整页
+KLINE_SYNC_INCREMENTAL = True
+# 最后缓存日期距今超过这个天数时不增量同步，重新请求整页
+KLINE_SYNC_MAX_DAYS = 30
+# 增量同步时每次请求的K线数量
+KLINE_SYNC_PAGE_SIZE = 10000
+# 前复权、后复权K线在本地用复权因子计算，只缓存不复权的K线，False 则由服务器复权并分别缓存
+KLINE_LOCAL_FQ = True
+# 周、月、年K线由日K线合成，5-60分钟K线由1分钟K线合成，只下载和缓存基础周期，False 则每个周期分别请求
+KLINE_RESAMPLE = True
+# 交易日历使用的指数，从这个指数缓存的日K线得到交易日
+CALENDAR_SYMBOL = "sh000001"
+# 交易日历检查指数缓存是否更新的间隔秒数
+CALENDAR_RELOAD_INTERVAL = 60
+# 逐笔交易缓存没有当天数据时一次请求的数量，足够一整天
+TRANSLIST_DAY_SIZE = 100000
+# 逐笔交易缓存盘中同步时请求的最新数量
+TRANSLIST_SYNC_SIZE = 2000
+# 策略引擎最多积压的K线事件数，满时回测线程等待策略引擎处理，0 不限制
+ENGIN_QUEUE_SIZE = 10000
+# 策略等待交易引擎处理信号的秒数，超时后记录日志并继续运行，例如实盘没有安装交易引擎，0 一直等待
+SIGNAL_TIMEOUT = 30
 # 回测数据导出目录
 EXPORT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))+"/export"
 
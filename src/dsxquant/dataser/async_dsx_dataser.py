@@ -0,0 +1,454 @@
+import asyncio
+import functools
+import struct
+import traceback
+from typing import Union
+
+from dsxquant.config import config
+from dsxquant.config.logconfig import logger
+from dsxquant.dataser.compress import CompressPolicy
+from dsxquant.common.cache import CacheHelper
+from dsxquant.dataser.parser.base import BaseParser,ResponseRecvFails,SendRequestPkgFails
+from dsxquant.dataser.parser.get_quotes import GetQuotesParser
+from dsxquant.dataser.parser.register import RegisterParser
+from dsxquant.dataser.parser.get_kline import GetKlinesParser
+from dsxquant.dataser.parser.login import LoginParser
+from dsxquant.dataser.parser.heart import HeartParser
+from dsxquant.dataser.parser.get_finance import GetFinanceParser
+from dsxquant.dataser.parser.get_stocks import GetStocksParser
+from dsxquant.dataser.parser.get_factors import GetFactorsParser
+from dsxquant.dataser.parser.get_sharebonus import GetShareBonusParser
+from dsxquant.dataser.parser.get_timesharing import GetTimeSharingParser
+from dsxquant.dataser.parser.get_translist import GetTransListParser
+from dsxquant.dataser.parser.get_category import GetCategoryParser
+from dsxquant.dataser.parser.sub_all_quotes import SubAllQuotesParser
+from dsxquant.dataser.parser.get_structure import GetStructureParser
+
+
+class AsyncSubscription(object):
+    """订阅的异步迭代器，每次推送返回订阅的解析器，结果在 result 中
+
+    async for response in dd.sub_quotes("sh000001"):
+        print(response.dataframe())
+    """
+
+    # 合并模式下队列里的占位，实际数据在 latest
+    LATEST = object()
+
+    def __init__(self,dataser,parser:BaseParser) -> None:
+        self.dataser:AsyncDsxDataser = dataser
+        self.parser = parser
+        self.queue = asyncio.Queue()
+        self.closed = False
+        # 合并模式下还未取走的最新推送
+        self.latest = None
+
+    def put(self,datas:dict):
+        if self.parser.conflate:
+            if self.latest is not None:
+                self.latest = self.parser.merge(self.latest,datas)
+                return
+            self.latest = datas
+            datas = AsyncSubscription.LATEST
+        self.queue.put_nowait(datas)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.queue.put_nowait(None)
+
+    async def cancel(self):
+        """取消订阅
+        """
+        self.dataser._unsubscribe(self)
+        self.parser.send_datas = self.parser.transdata(cancel=True)
+        await self.dataser._write(self.parser)
+        self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        datas = await self.queue.get()
+        if datas is None:
+            raise StopAsyncIteration
+        if datas is AsyncSubscription.LATEST:
+            datas,self.latest = self.latest,None
+        if self.parser.enable_cache:
+            # 推送会写入缓存，磁盘读写放到线程池
+            self.parser.result = await self.dataser._run(self.parser.parseResponse,datas)
+        else:
+            self.parser.result = self.parser.parseResponse(datas)
+        return self.parser
+
+
+class AsyncDsxDataser(object):
+    """asyncio 版本的数据采集器，接口与 DsxDataser 一致，所有请求都需要 await
+    一个读任务按 request_id 分发返回，不再为每个请求创建线程，
+    解析器构建请求和解析返回时的缓存读写放到线程池执行，不阻塞事件循环
+    """
+
+    def __init__(self,ip:str=config.DEFAULT_SERVER_IP,port:int=config.DEFAULT_PORT,
+    app_id:str=None,app_secret:str=None,email:str=None,compress_policy:CompressPolicy=None) -> None:
+        self.ip = ip
+        self.port = port
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.email = email
+        # 请求压缩策略
+        self.compress_policy = compress_policy or CompressPolicy()
+        self.connected = False
+        self.reader:asyncio.StreamReader = None
+        self.writer:asyncio.StreamWriter = None
+        # 等待返回的请求 {request_id:(接口名称,Future)}
+        self.pending = {}
+        # 订阅 {request_id:AsyncSubscription}
+        self.subscriptions = {}
+        # 接收任务
+        self.recv_task = None
+
+    async def connect(self,islogin=True):
+        """连接服务器
+
+        Returns:
+            AsyncDsxDataser: 返回实例本身，失败返回False
+        """
+        try:
+            self.reader,self.writer = await asyncio.wait_for(asyncio.open_connection(self.ip,self.port),config.CONNECT_TIMEOUT)
+        except asyncio.TimeoutError as e:
+            logger.error("connection expired, server_ip=%s port=%s" % (self.ip,self.port))
+            return False
+        except OSError as e:
+            logger.error(e)
+            return False
+        self.recv_task = asyncio.ensure_future(self._recv())
+        # 登录
+        if self.app_id!="" and self.app_secret!="" and islogin:
+            result = (await self.login()).datas()
+            if result.success==False:
+                logger.info(result.msg)
+                await self.close()
+                return False
+        self.connected = True
+        # 订阅推送需要心跳包
+        await self.heart()
+        return self
+
+    async def close(self):
+        self.connected = False
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+        if self.recv_task:
+            self.recv_task.cancel()
+            self.recv_task = None
+        self.__close_all()
+
+    async def __aenter__(self):
+        if await self.connect()!=False:
+            return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+        return False
+
+    def __close_all(self):
+        for api_name,future in self.pending.values():
+            if not future.done():
+                future.set_exception(ResponseRecvFails("connection closed"))
+        self.pending.clear()
+        for sub in self.subscriptions.values():
+            sub.close()
+        self.subscriptions.clear()
+
+    def __match(self,body_info:dict):
+        """按 request_id 找到等待返回的请求或者订阅，没有带 request_id 的推送按接口名称匹配，和多路复用一致
+
+        Returns:
+            tuple: (请求的Future,订阅数组)
+        """
+        request_id = body_info.get("request_id")
+        if request_id is not None:
+            item = self.pending.pop(str(request_id),None)
+            if item: return item[1],[]
+            sub = self.subscriptions.get(str(request_id))
+            return None,sub and [sub] or []
+        act = body_info.get("act")
+        for rid,(api_name,future) in self.pending.items():
+            if api_name==act:
+                del self.pending[rid]
+                return future,[]
+        return None,[sub for sub in self.subscriptions.values() if sub.parser.api_name==act]
+
+    async def _recv(self):
+        """循环接收服务器返回，按 request_id 分发给请求或订阅
+        """
+        try:
+            while True:
+                head_buf = await self.reader.readexactly(config.HEADER_LEN)
+                header_size = struct.unpack(config.PACK_TYPE, head_buf)
+                body_buf = await self.reader.readexactly(header_size[1])
+                try:
+                    body_info = BaseParser.unpack(header_size[0],body_buf)
+                except Exception as ex:
+                    logger.error(traceback.format_exc())
+                    continue
+                future,subs = self.__match(body_info)
+                if future:
+                    if not future.done(): future.set_result(body_info)
+                    continue
+                for sub in subs:
+                    sub.put(body_info)
+                if not subs:
+                    logger.debug("drop unmatched response act=%s request_id=%s" % (body_info.get("act"),body_info.get("request_id")))
+        except asyncio.IncompleteReadError:
+            # 服务器关闭连接
+            pass
+        except asyncio.CancelledError:
+            raise
+        except OSError as ex:
+            logger.error(ex)
+        finally:
+            self.connected = False
+            self.__close_all()
+
+    async def _run(self,func,*args):
+        """在默认线程池中执行同步函数，解析器读写缓存时不阻塞事件循环
+
+        Returns:
+            any: 函数的返回值
+        """
+        return await asyncio.get_event_loop().run_in_executor(None,functools.partial(func,*args))
+
+    async def _write(self,parser:BaseParser):
+        if self.writer==None:
+            raise SendRequestPkgFails("client is none")
+        self.writer.write(parser.pack())
+        await self.writer.drain()
+
+    async def _call(self,parser:BaseParser):
+        """发送请求并等待返回
+
+        Returns:
+            BaseParser: 解析器，结果在 result 中
+        """
+        result = None
+        try:
+            if parser.cache:
+                result = parser._call_api()
+            else:
+                future = asyncio.get_event_loop().create_future()
+                self.pending[str(parser.request_id)] = (parser.api_name,future)
+                try:
+                    await self._write(parser)
+                    datas = await asyncio.wait_for(future,config.CONNECT_TIMEOUT)
+                finally:
+                    self.pending.pop(str(parser.request_id),None)
+                # 解析时会写入缓存，磁盘读写放到线程池
+                result = await self._run(parser.parseResponse,datas)
+        except asyncio.TimeoutError as ex:
+            logger.error(ResponseRecvFails("socket timeout"))
+        except ResponseRecvFails as ex:
+            # 连接断开时等待中的请求会收到这个异常
+            logger.error(ex)
+        except SendRequestPkgFails as ex:
+            logger.error(ex)
+        except Exception as ex:
+            logger.error(ex)
+        parser.result = result
+        return parser
+
+    async def _subscribe(self,parser:BaseParser) -> AsyncSubscription:
+        sub = AsyncSubscription(self,parser)
+        self.subscriptions[str(parser.request_id)] = sub
+        try:
+            await self._write(parser)
+        except Exception as ex:
+            logger.error(ex)
+            self._unsubscribe(sub)
+            sub.close()
+        return sub
+
+    def _unsubscribe(self,sub:AsyncSubscription):
+        self.subscriptions.pop(str(sub.parser.request_id),None)
+
+    # 接口
+    async def register(self,email:str,findapp:bool=False):
+        """注册
+        """
+        r = RegisterParser(None,conn=self)
+        r.setParams(email,findapp=findapp)
+        return await self._call(r)
+
+    async def login(self):
+        """登录
+        """
+        r = LoginParser(None,conn=self)
+        r.setParams(self.app_id,self.app_secret)
+        return await self._call(r)
+
+    async def heart(self):
+        """心跳包
+        """
+        r = HeartParser(None,False,conn=self)
+        r.setParams(self.app_id,self.app_secret)
+        await self._write(r)
+        return r
+
+    async def get_category(self,category_id:int=0):
+        """请求分类信息
+
+        Args:
+            category_id (int): 分类代码 0=行业 1=概念 2=地域
+        """
+        r = GetCategoryParser(None,conn=self)
+        r.setParams(category_id)
+        return await self._call(r)
+
+    async def get_hangye(self):
+        """请求行业分类
+        """
+        return await self.get_category(0)
+
+    async def get_gainian(self):
+        """请求概念分类
+        """
+        return await self.get_category(1)
+
+    async def get_diyu(self):
+        """请求地域分类
+        """
+        return await self.get_category(2)
+
+    async def get_stocks(self,market:int=None,symbol:str=None,hangye:str=None,gainian:str=None,diyu:str=None,listing_date:str=None,category:int=0):
+        """请求证券详情信息
+
+        Args:
+            market (int): 市场编号
+            symbol (str): 证券代码 为空返回市场股票代码列表
+        """
+        r = GetStocksParser(None,conn=self)
+        r.setParams(symbol,market,hangye,gainian,diyu,listing_date,category)
+        return await self._call(r)
+
+    async def get_quotes(self,symbols:Union[list,str,tuple]):
+        """请求实时行情
+
+        Args:
+            symbol (str): 证券代码
+        """
+        r = GetQuotesParser(None,conn=self)
+        r.setParams(symbols)
+        return await self._call(r)
+
+    async def get_price(self,symbols:Union[list,str,tuple]):
+        return await self.get_quotes(symbols)
+
+    async def sub_quotes(self,symbols:Union[list,str,tuple],conflate:bool=False) -> AsyncSubscription:
+        """订阅实时行情，返回异步迭代器
+
+        Args:
+            symbol (str): 证券代码
+            conflate (bool, optional): 来不及处理时按代码合并推送，只返回每个代码最新的行情. Defaults to False.
+        """
+        r = GetQuotesParser(None,False,conn=self)
+        r.conflate = conflate
+        r.setParams(symbols)
+        return await self._subscribe(r)
+
+    async def sub_price(self,symbols:Union[list,str,tuple],conflate:bool=False) -> AsyncSubscription:
+        return await self.sub_quotes(symbols,conflate)
+
+    async def sub_all_quotes(self,conflate:bool=False) -> AsyncSubscription:
+        """订阅全市场实时行情，返回异步迭代器
+
+        Args:
+            conflate (bool, optional): 来不及处理时按代码合并推送，只返回每个代码最新的行情. Defaults to False.
+        """
+        r = SubAllQuotesParser(None,False,conn=self)
+        r.conflate = conflate
+        r.setParams()
+        return await self._subscribe(r)
+
+    async def sub_all_price(self,conflate:bool=False) -> AsyncSubscription:
+        return await self.sub_all_quotes(conflate)
+
+    async def get_klines(self,symbol:str,market:int,page:int=1,page_size:int=320,fq:str=config.FQ.DEFAULT,cycle:config.CYCLE=config.CYCLE.DAY,start:str=None,end:str=None,enable_cache:bool=True):
+        """请求历史K线图
+
+        Args:
+            symbol (str): 证券代码
+            market (int): 市场代码
+            page (int, optional): 页码. Defaults to 1.
+            page_size (int, optional): 每页大小. Defaults to 320.
+            fq (str, optional): 复权类型. Defaults to config.FQ.DEFAULT.
+        """
+        if enable_cache: await self.load_factors(symbol,market,fq)
+        r = GetKlinesParser(None,conn=self)
+        await self._run(r.setParams,symbol,market,page,page_size,fq,cycle,start,end,enable_cache)
+        return await self._call(r)
+
+    async def get_finance(self,symbol,market:int,report_type:config.REPORT_TYPE=config.REPORT_TYPE.DEFAULT,report_date="",start:str=None,end:str=None,enable_cache:bool=True):
+        """请求财务信息
+
+        Args:
+            symbol (str): 证券代码
+            market (int): 市场代码
+            report_type (config.REPORT_TYPE): 财务报表类型
+            report_date (str): 报表日期 %Y-%m-%d，默认为空是取最新日期的报表
+        """
+        r = GetFinanceParser(None,conn=self)
+        await self._run(r.setParams,symbol,market,report_type,report_date,start,end,enable_cache)
+        return await self._call(r)
+
+    async def get_sharebonus(self,symbol:str,market:int,start:str=None,end:str=None,enable_cache:bool=True):
+        """请求分红配股信息
+        """
+        r = GetShareBonusParser(None,conn=self)
+        await self._run(r.setParams,symbol,market,start,end,enable_cache)
+        return await self._call(r)
+
+    async def get_structure(self,symbol:str,market:int,start:str=None,end:str=None,enable_cache:bool=True):
+        """请求股本结构信息
+        """
+        r = GetStructureParser(None,conn=self)
+        await self._run(r.setParams,symbol,market,start,end,enable_cache)
+        return await self._call(r)
+
+    async def get_factors(self,symbol:str,market:int):
+        """请求复权因子信息
+        """
+        r = GetFactorsParser(None,conn=self)
+        r.setParams(symbol,market)
+        return await self._call(r)
+
+    async def load_factors(self,symbol:str,market:int,fq:str):
+        """本地复权和前复权增量同步需要复权因子，今天还没有缓存时先请求，每个证券每天只请求一次
+        """
+        if not (CacheHelper.local_fq(fq) or fq==config.FQ.QFQ): return
+        if symbol and not symbol[0:2].isdigit():
+            market = config.MARKET_VAL.index(symbol[0:2])
+            symbol = symbol[2:]
+        if await self._run(CacheHelper.get_factors,symbol,market) is not None: return
+        await self.get_factors(symbol,market)
+
+    async def get_timesharing(self,symbol:str,market:int,trade_date:str="",enable_cache:bool=True):
+        """请求分时线
+        """
+        r = GetTimeSharingParser(None,conn=self)
+        await self._run(r.setParams,symbol,market,trade_date,enable_cache)
+        return await self._call(r)
+
+    async def sub_timesharing(self,symbol:str,market:int,trade_date:str="") -> AsyncSubscription:
+        """订阅分时线，返回异步迭代器
+        """
+        r = GetTimeSharingParser(None,False,conn=self)
+        await self._run(r.setParams,symbol,market,trade_date)
+        return await self._subscribe(r)
+
+    async def get_translist(self,symbol:str,market:int,trade_date:str="",page:int=1,page_size:int=10,enable_cache:bool=True):
+        """获取逐笔交易信息
+        """
+        r = GetTransListParser(None,conn=self)
+        await self._run(r.setParams,symbol,market,trade_date,page,page_size,enable_cache)
+        return await self._call(r)
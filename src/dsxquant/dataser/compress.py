@@ -0,0 +1,40 @@
+import gzip
+import zlib
+from dsxquant.config import config
+
+
+class CompressPolicy(object):
+    """请求压缩策略
+    小于阈值的包不压缩直接发送，头部压缩标识为0，服务器按标识处理
+
+    Args:
+        level (int, optional): gzip 压缩级别 1-9. Defaults to config.GZIP_LEVEL.
+        threshold (int, optional): 小于该字节数不压缩. Defaults to config.GZIP_THRESHOLD.
+        reuse (bool, optional): 复用 zlib 压缩对象，省去每次初始化. Defaults to config.GZIP_REUSE.
+        enable (bool, optional): 是否压缩，为空时跟随 config.ENABLE_GZIP. Defaults to None.
+    """
+
+    def __init__(self,level:int=None,threshold:int=None,reuse:bool=None,enable:bool=None) -> None:
+        self.level = level if level is not None else config.GZIP_LEVEL
+        self.threshold = threshold if threshold is not None else config.GZIP_THRESHOLD
+        self.reuse = reuse if reuse is not None else config.GZIP_REUSE
+        self.enable = enable
+        # 压缩对象模板，每次 copy 一份使用，输出 gzip 格式
+        self.__template = self.reuse and zlib.compressobj(self.level,zlib.DEFLATED,16+zlib.MAX_WBITS) or None
+
+    def compress(self,body_pkg:bytes):
+        """按策略压缩包体
+
+        Args:
+            body_pkg (bytes): 包体
+
+        Returns:
+            tuple: (是否压缩,包体)
+        """
+        enable = self.enable if self.enable is not None else config.ENABLE_GZIP
+        if not enable or len(body_pkg)<self.threshold:
+            return False,body_pkg
+        if self.__template:
+            compressor = self.__template.copy()
+            return True,compressor.compress(body_pkg)+compressor.flush()
+        return True,gzip.compress(body_pkg,self.level)
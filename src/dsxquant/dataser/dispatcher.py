@@ -0,0 +1,81 @@
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import Executor
+from dsxquant.config import config
+from dsxquant.config.logconfig import logger
+
+
+class Dispatcher(object):
+    """订阅回调分发
+    接收线程只负责收包解码，解析和回调交给线程池执行，
+    同一个订阅的消息按到达顺序串行执行，不同订阅之间并行执行，
+    订阅开启 conflate 时积压的推送会合并成一条
+
+    Args:
+        executor (Executor): 执行回调的线程池
+        maxsize (int, optional): 每个订阅最多积压的消息数，0 不限制. Defaults to config.DISPATCH_QUEUE_SIZE.
+        block (bool, optional): 积压满时阻塞接收线程，否则丢弃最早的消息. Defaults to config.DISPATCH_BLOCK.
+    """
+
+    def __init__(self,executor:Executor,maxsize:int=None,block:bool=None) -> None:
+        self.executor = executor
+        self.maxsize = maxsize if maxsize is not None else config.DISPATCH_QUEUE_SIZE
+        self.block = block if block is not None else config.DISPATCH_BLOCK
+        self.lock = threading.Condition()
+        # 每个订阅待处理的消息 {api:deque}
+        self.queues = {}
+        # 正在执行回调的订阅
+        self.running = set()
+        # 丢弃的消息数
+        self.dropped = 0
+
+    def qsize(self,api) -> int:
+        """订阅积压的消息数
+        """
+        with self.lock:
+            q = self.queues.get(api)
+            return q and len(q) or 0
+
+    def submit(self,api,datas:dict):
+        """提交一条订阅消息
+
+        Args:
+            api (BaseParser): 订阅的解析器
+            datas (dict): 服务器推送的数据
+        """
+        with self.lock:
+            q = self.queues.get(api)
+            if q is None:
+                q = self.queues[api] = deque()
+            if api.conflate and q:
+                # 合并模式下只保留一个待回调的推送，回调时拿到的是合并后的最新状态
+                q[-1] = api.merge(q[-1],datas)
+                return
+            while self.maxsize and len(q)>=self.maxsize:
+                if self.block:
+                    self.lock.wait()
+                    continue
+                q.popleft()
+                self.dropped += 1
+                if self.dropped==1 or self.dropped%1000==0:
+                    logger.warning("%s dispatch queue is full, %d messages dropped" % (api.api_name,self.dropped))
+            q.append(datas)
+            if api in self.running: return
+            self.running.add(api)
+        self.executor.submit(self._run,api)
+
+    def _run(self,api):
+        while True:
+            with self.lock:
+                q = self.queues.get(api)
+                if not q:
+                    self.running.discard(api)
+                    return
+                datas = q.popleft()
+                self.lock.notify_all()
+            try:
+                api.result = api.parseResponse(datas)
+                api.call_back(api)
+            except Exception as ex:
+                logger.error(traceback.format_exc())
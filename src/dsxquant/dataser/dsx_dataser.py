@@ -1,4 +1,4 @@
-from concurrent.futures import ALL_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import ALL_COMPLETED, Executor, ThreadPoolExecutor, wait
 import gzip
 import json
 import socket
@@ -27,6 +27,11 @@ from dsxquant.dataser.parser.get_category import GetCategoryParser
 from dsxquant.dataser.models.result import ResultModel
 from dsxquant.dataser.parser.sub_all_quotes import SubAllQuotesParser
 from dsxquant.dataser.parser.get_structure import GetStructureParser
+from dsxquant.dataser.multiplexer import Multiplexer
+from dsxquant.dataser.frame_reader import FrameReader
+from dsxquant.dataser.frame_writer import FrameWriter
+from dsxquant.dataser.dispatcher import Dispatcher
+from dsxquant.dataser.compress import CompressPolicy
 from dsxquant.common.cache import CacheHelper
 
 class WithExpationFails(BaseException):
@@ -39,16 +44,24 @@ class DsxDataser(object):
 
     def __init__(self,ip:str=config.DEFAULT_SERVER_IP,port:int=config.DEFAULT_PORT,
     app_id:str=None,app_secret:str=None,
-    email:str=None,sync:bool=True) -> None:
+    email:str=None,sync:bool=True,multiplex:bool=False,compress_policy:CompressPolicy=None,
+    dispatch_executor:Executor=None,dispatch_queue_size:int=None,dispatch_block:bool=None) -> None:
         self.ip = ip
         self.port = port
         self.app_id = app_id
         self.app_secret = app_secret
         self.email = email
         self.sync = sync
+        # 多路复用，同步请求共用一个连接并发发送，按request_id分发返回
+        self.multiplex = multiplex
+        # 请求压缩策略
+        self.compress_policy = compress_policy or CompressPolicy()
         self.enable_zip = True
         self.connected = False
         self.__init()
+        # 订阅回调分发，默认使用自带的线程池
+        # 积压上限和积压满时的处理为空时跟随 config.DISPATCH_QUEUE_SIZE、config.DISPATCH_BLOCK
+        self.dispatcher = Dispatcher(dispatch_executor or self.pool,dispatch_queue_size,dispatch_block)
 
     def __init(self):
         self.client:socket.socket = None
@@ -64,6 +77,12 @@ class DsxDataser(object):
         self.need_connect = False
         # 异步接收线程
         self.recv_thread = None
+        # 帧读取器，每个连接复用一个接收缓冲区
+        self.frame_reader:FrameReader = None
+        # 发送线程，异步和多路复用模式下使用
+        self.frame_writer:FrameWriter = None
+        # 多路复用读线程
+        self.multiplexer:Multiplexer = None
         self.__close_callback = None
     
     def __setup(self):
@@ -78,6 +97,17 @@ class DsxDataser(object):
         """
         dsx = DsxDataser(ip,port,app_id,app_secret,sync=False)
         return dsx.connect()
+
+    @staticmethod
+    def multiplexconnect(ip:str=config.DEFAULT_SERVER_IP,port:int=config.DEFAULT_PORT,app_id:str=None,app_secret:str=None):
+        """多路复用连接服务器
+        请求发送后立即返回，读取结果时才等待，多个请求在同一个连接上流水线执行
+
+        Returns:
+            DsxDataser: 返回实例本身
+        """
+        dsx = DsxDataser(ip,port,app_id,app_secret,multiplex=True)
+        return dsx.connect()
     
     # def asyncconnect(self):
     #     self.sync = False
@@ -106,6 +136,7 @@ class DsxDataser(object):
         if DsxDataser.debug : logger.debug("connecting to server : %s on port :%s sync:%s" % (self.ip, self.port,self.sync))
         try:
             self.client.connect((self.ip, self.port))
+            self.frame_reader = FrameReader(self.client)
         except socket.timeout as e:
             logger.error(e)
             if DsxDataser.debug : logger.debug("connection expired")
@@ -133,6 +164,12 @@ class DsxDataser(object):
 
         self.__setup()
         self.connected = True
+        if self.sync==False or self.multiplex:
+            # 登录完成后启动发送线程，之后的请求都放入发送队列
+            self.frame_writer = FrameWriter(self.client,on_error=self.__send_fails).start()
+        if self.sync and self.multiplex:
+            # 登录完成后再启动读线程，之后所有返回都由读线程分发
+            self.multiplexer = Multiplexer(self.frame_reader).start()
         if self.sync==False:
             # 启用订阅模式
             # 异步订阅模式需要启动心跳包
@@ -153,11 +190,26 @@ class DsxDataser(object):
             if DsxDataser.debug : logger.debug("disconnected")
         
     
+    def __send_fails(self,ex:Exception):
+        """发送线程发送失败，连接已经不可用，标记需要重连，
+        结束多路复用中等待的请求，关闭套接字让接收线程退出并回调 close_callback
+        """
+        self.connected = False
+        self.need_connect = True
+        if self.multiplexer: self.multiplexer.close()
+        self.disconnect()
+
     def close(self):
         if DsxDataser.debug : logger.debug("close socket ....")
         self.sync = True
         self.is_close = True
         self.connected = False
+        if self.multiplexer:
+            self.multiplexer.close()
+            self.multiplexer = None
+        if self.frame_writer:
+            self.frame_writer.close()
+            self.frame_writer = None
         self.disconnect()
     
     def close_callback(self,callback):
@@ -197,47 +249,23 @@ class DsxDataser(object):
         """
         while(self.sync==False):
             try:
-                with DsxDataser.lock:
-                    if self.is_close or self.sync : break
-                    head_buf = self.client.recv(config.HEADER_LEN)
-                    if self.is_close  or self.sync: break
-                    body_buf = bytearray()
-                    if len(head_buf) == config.HEADER_LEN:
-                        # 解包头部长度
-                        header_size = struct.unpack(config.PACK_TYPE, head_buf)
-                        self.enable_zip = bool(header_size[0])
-                        body_size = header_size[1]
-                        body_buf = self.client.recv(body_size)
-                        while(len(body_buf)<body_size):
-                            # 继续接收 处理大数据，有可能一个数据流大于缓冲区
-                            temp_size = body_size - len(body_buf)
-                            if temp_size<=0 : break
-                            body_buf += self.client.recv(temp_size)
-                        if self.enable_zip:
-                            # 解压
-                            body_buf = gzip.decompress(body_buf)
-                        # 解码字符串
-                        body_info = body_buf.decode('utf-8')
-                        body_info = json.loads(body_info)
-                        # 得到接口名称
-                        rct = body_info["act"]
-                        # 得到api调用句柄
-                        if self.apis.__len__()>0:
-                            api:BaseParser = self.apis.get(rct)
-                            # 返回给api回调函数
-                            if api!=None:
-                                if api.call_back!=None:
-                                    api.result = api.parseResponse(body_info)
-                                    api.call_back(api)
-                            del api
-                        del body_info
-                    else:
-                        if DsxDataser.debug : logger.debug("_revc head buf is wrong...")
-                        # 服务器关闭连接后会返回数据长度为0
-                        self.need_connect = True
-                        break
-                    # 清理
-                    del head_buf,body_buf
+                if self.is_close or self.sync : break
+                body_info = self.frame_reader.recv()
+                if self.is_close  or self.sync: break
+                if body_info is not None:
+                    self.enable_zip = self.frame_reader.enable_zip
+                    # 得到接口名称
+                    rct = body_info["act"]
+                    # 得到api调用句柄
+                    api:BaseParser = self.apis.get(rct)
+                    # 交给分发线程池解析并回调，接收线程不等待回调执行
+                    if api!=None and api.call_back!=None:
+                        self.dispatcher.submit(api,body_info)
+                else:
+                    if DsxDataser.debug : logger.debug("_revc head buf is wrong...")
+                    # 服务器关闭连接后会返回数据长度为0
+                    self.need_connect = True
+                    break
             except socket.timeout as ex:
                 # 超时处理
                 logger.error("_revc timed out, server_ip=%s port=%d" % (self.ip,self.port))
@@ -247,7 +275,8 @@ class DsxDataser(object):
                 break
                 # logger.error(ex)
             except socket.error as ex:
-                logger.error(ex)
+                # 主动关闭时读取会失败，不用报错
+                if not self.is_close: logger.error(ex)
                 # IO通信异常退出
                 self.need_connect = True
                 break
@@ -329,7 +358,7 @@ class DsxDataser(object):
         """注册
         """
         # 请求注册接口
-        r =  RegisterParser(self.client)
+        r =  RegisterParser(self.client,conn=self)
         r.setParams(email,findapp=findapp)
         return r.call_api()
     
@@ -338,7 +367,7 @@ class DsxDataser(object):
         """登录
         """
         # 请求注册接口
-        r =  LoginParser(self.client)
+        r =  LoginParser(self.client,conn=self)
         r.setParams(self.app_id,self.app_secret)
         return r.call_api()
     
@@ -350,7 +379,7 @@ class DsxDataser(object):
         def heart_response(response):
             # if DsxDataser.debug : logger.debug(response)
             pass
-        r =  HeartParser(self.client,False,heart_response)
+        r =  HeartParser(self.client,False,heart_response,conn=self)
         r.setParams(self.app_id,self.app_secret)
         if(not self.sync): self.__save_api(r)
         return r.call_api()
@@ -362,7 +391,7 @@ class DsxDataser(object):
             category_id (int): 分类代码 0=行业 1=概念 2=地域
         """
         if not self.connected:return
-        r =  GetCategoryParser(self.client)
+        r =  GetCategoryParser(self.client,conn=self)
         r.setParams(category_id)
         return r.call_api()
 
@@ -388,7 +417,7 @@ class DsxDataser(object):
             symbol (str): 证券代码 为空返回市场股票代码列表
         """
         if not self.connected:return
-        r =  GetStocksParser(self.client)
+        r =  GetStocksParser(self.client,conn=self)
         r.setParams(symbol,market,hangye,gainian,diyu,listing_date,category)
         return r.call_api()
 
@@ -399,7 +428,7 @@ class DsxDataser(object):
             symbol (str): 证券代码
         """
         if not self.connected:return
-        r =  GetQuotesParser(self.client,self.sync,None)
+        r =  GetQuotesParser(self.client,self.sync,None,conn=self)
         r.setParams(symbols)
         if(not self.sync): self.__save_api(r)
         return r.call_api()
@@ -412,34 +441,39 @@ class DsxDataser(object):
         """
         return self.get_quotes(symbols)
 
-    def sub_quotes(self,symbols:Union[list,str,tuple],callback):
+    def sub_quotes(self,symbols:Union[list,str,tuple],callback,conflate:bool=False):
         """订阅实时行情
         订阅后系统会持续推行情过来，需要用户自己实现回调函数
 
         Args:
             symbol (str): 证券代码
+            conflate (bool, optional): 回调来不及处理时按代码合并推送，只回调每个代码最新的行情. Defaults to False.
         """
         if not self.connected:return
-        r =  GetQuotesParser(self.client,self.sync,callback)
+        r =  GetQuotesParser(self.client,self.sync,callback,conn=self)
+        r.conflate = conflate
         r.setParams(symbols)
         if(not self.sync): self.__save_api(r)
         return r.call_api()
     
-    def sub_price(self,symbols:Union[list,str,tuple],callback):
-        return self.sub_quotes(symbols,callback)
+    def sub_price(self,symbols:Union[list,str,tuple],callback,conflate:bool=False):
+        return self.sub_quotes(symbols,callback,conflate)
     
-    def sub_all_quotes(self,callback):
+    def sub_all_quotes(self,callback,conflate:bool=False):
         """订阅全市场实时行情
 
+        Args:
+            conflate (bool, optional): 回调来不及处理时按代码合并推送，只回调每个代码最新的行情. Defaults to False.
         """
         if not self.connected:return
-        r =  SubAllQuotesParser(self.client,self.sync,callback)
+        r =  SubAllQuotesParser(self.client,self.sync,callback,conn=self)
+        r.conflate = conflate
         r.setParams()
         if(not self.sync): self.__save_api(r)
         return r.call_api()
         
-    def sub_all_price(self,callback):
-        return self.sub_all_quotes(callback)
+    def sub_all_price(self,callback,conflate:bool=False):
+        return self.sub_all_quotes(callback,conflate)
 
     def get_klines(self,symbol:str,market:int,page:int=1,page_size:int=320,fq:str=config.FQ.DEFAULT,cycle:config.CYCLE=config.CYCLE.DAY,start:str=None,end:str=None,enable_cache:bool=True):
         """请求历史K线图
@@ -456,7 +490,8 @@ class DsxDataser(object):
             _type_: 历史行情数据
         """
         if not self.connected:return
-        r =  GetKlinesParser(self.client,self.sync,None)
+        if enable_cache: self.load_factors(symbol,market,fq)
+        r =  GetKlinesParser(self.client,self.sync,None,conn=self)
         r.setParams(symbol,market,page,page_size,fq,cycle,start,end,enable_cache)
         if(not self.sync): self.__save_api(r)
         return r.call_api()
@@ -480,7 +515,7 @@ class DsxDataser(object):
             dict: 财务数据
         """
         if not self.connected:return
-        r =  GetFinanceParser(self.client)
+        r =  GetFinanceParser(self.client,conn=self)
         r.setParams(symbol,market,report_type,report_date,start,end,enable_cache)
         if(not self.sync): self.__save_api(r)
         return r.call_api()
@@ -498,7 +533,7 @@ class DsxDataser(object):
             _type_: _description_
         """
         if not self.connected:return
-        r =  GetShareBonusParser(self.client)
+        r =  GetShareBonusParser(self.client,conn=self)
         r.setParams(symbol,market,start,end,enable_cache)
         return r.call_api()
 
@@ -515,7 +550,7 @@ class DsxDataser(object):
             _type_: _description_
         """
         if not self.connected:return
-        r =  GetStructureParser(self.client)
+        r =  GetStructureParser(self.client,conn=self)
         r.setParams(symbol,market,start,end,enable_cache)
         return r.call_api()
     
@@ -527,10 +562,29 @@ class DsxDataser(object):
             market (str): 市场代码
         """
         if not self.connected:return
-        r =  GetFactorsParser(self.client)
+        r =  GetFactorsParser(self.client,conn=self)
         r.setParams(symbol,market)
         return r.call_api()
     
+    def load_factors(self,symbol:str,market:int,fq:str):
+        """本地复权和前复权增量同步需要复权因子，今天还没有缓存时先请求，每个证券每天只请求一次
+
+        Args:
+            symbol (str): 证券代码
+            market (int): 市场代码
+            fq (str): 复权类型
+        """
+        if not (CacheHelper.local_fq(fq) or fq==config.FQ.QFQ): return
+        if symbol and not symbol[0:2].isdigit():
+            market = config.MARKET_VAL.index(symbol[0:2])
+            symbol = symbol[2:]
+        if CacheHelper.get_factors(symbol,market) is not None: return
+        # 异步模式下无法等待返回
+        if not self.sync: return
+        r = self.get_factors(symbol,market)
+        # 读取结果时等待返回，返回后写入缓存
+        if r is not None: r.result
+
     @deprecated
     def get_timeshring(self,symbol:str,market:int,trade_date:str="",enable_cache:bool=True):
         """请求分时线
@@ -544,7 +598,7 @@ class DsxDataser(object):
             _type_: _description_
         """
         if not self.connected:return
-        r =  GetTimeSharingParser(self.client,self.sync,None)
+        r =  GetTimeSharingParser(self.client,self.sync,None,conn=self)
         r.setParams(symbol,market,trade_date,enable_cache)
         if(not self.sync): self.__save_api(r)
         return r.call_api()
@@ -561,7 +615,7 @@ class DsxDataser(object):
             _type_: _description_
         """
         if not self.connected:return
-        r =  GetTimeSharingParser(self.client,self.sync,None)
+        r =  GetTimeSharingParser(self.client,self.sync,None,conn=self)
         r.setParams(symbol,market,trade_date,enable_cache)
         if(not self.sync): self.__save_api(r)
         return r.call_api()
@@ -580,7 +634,7 @@ class DsxDataser(object):
             _type_: _description_
         """
         if not self.connected:return
-        r =  GetTimeSharingParser(self.client,self.sync,callback)
+        r =  GetTimeSharingParser(self.client,self.sync,callback,conn=self)
         r.setParams(symbol,market,trade_date)
         if(not self.sync): self.__save_api(r)
         return r.call_api()
@@ -599,6 +653,6 @@ class DsxDataser(object):
             _type_: GetTransListParser
         """
         if not self.connected:return
-        r =  GetTransListParser(self.client)
+        r =  GetTransListParser(self.client,conn=self)
         r.setParams(symbol,market,trade_date,page,page_size,enable_cache)
         return r.call_api()
\ No newline at end of file
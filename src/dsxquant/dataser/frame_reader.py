@@ -0,0 +1,81 @@
+import socket
+import struct
+import zlib
+from dsxquant.config import config
+from dsxquant.common import codec
+
+
+def unpack(enable_zip:bool,body_buf) -> dict:
+    """解包返回数据，支持 bytes/bytearray/memoryview，解压直接读取缓冲区不再拷贝
+
+    Args:
+        enable_zip (bool): 头部压缩标识
+        body_buf (bytes): 包体
+
+    Returns:
+        dict: 返回的json字典信息
+    """
+    if enable_zip:
+        # gzip 格式
+        body_buf = zlib.decompress(body_buf,16+zlib.MAX_WBITS)
+    # 直接从字节还原json字典信息
+    return codec.loads(body_buf)
+
+
+class FrameReader(object):
+    """按协议读取一帧数据，每个连接一个
+    使用 recv_into 直接写入可复用的缓冲区，不再每次拼接 bytes，
+    缓冲区按需扩容后一直复用，解压直接从缓冲区视图读取
+    """
+
+    def __init__(self,client:socket.socket,buffer_size:int=None) -> None:
+        self.client = client
+        self.header = bytearray(config.HEADER_LEN)
+        self.header_view = memoryview(self.header)
+        # 为空时跟随 config.RECV_BUFFER_SIZE
+        self.buffer = bytearray(buffer_size if buffer_size is not None else config.RECV_BUFFER_SIZE)
+        self.view = memoryview(self.buffer)
+        # 最近一帧的压缩标识
+        self.enable_zip = False
+        # 当前帧读取进度，超时后再次调用 recv 会继续读取
+        self.__head_len = 0
+        self.__body_size = -1
+        self.__body_len = 0
+
+    def __grow(self,size:int):
+        capacity = len(self.buffer)
+        if size<=capacity: return
+        while capacity<size: capacity *= 2
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+
+    def __reset(self):
+        self.__head_len = 0
+        self.__body_size = -1
+        self.__body_len = 0
+
+    def recv(self) -> dict:
+        """读取一帧数据
+        读取中途超时会抛出 socket.timeout，已读取的部分会保留，再次调用时继续读取
+
+        Returns:
+            dict: 返回的json字典信息，服务器关闭连接返回None
+        """
+        while self.__head_len<config.HEADER_LEN:
+            size = self.client.recv_into(self.header_view[self.__head_len:])
+            if size==0: return
+            self.__head_len += size
+        if self.__body_size<0:
+            # 解包头部长度
+            header_size = struct.unpack(config.PACK_TYPE, self.header)
+            self.enable_zip = bool(header_size[0])
+            self.__body_size = header_size[1]
+            self.__grow(self.__body_size)
+        while self.__body_len<self.__body_size:
+            # 继续接收 处理大数据，有可能一个数据流大于缓冲区
+            size = self.client.recv_into(self.view[self.__body_len:self.__body_size])
+            if size==0: return
+            self.__body_len += size
+        body_size = self.__body_size
+        self.__reset()
+        return unpack(self.enable_zip,self.view[:body_size])
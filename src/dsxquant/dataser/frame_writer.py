@@ -0,0 +1,109 @@
+import queue
+import socket
+import threading
+from dsxquant.config import config
+from dsxquant.config.logconfig import logger
+
+
+class SendQueueFull(Exception):
+    pass
+
+
+class FrameWriter(object):
+    """发送线程，每个连接一个
+    请求打包后放入有界队列，由发送线程用 sendall 发出，
+    队列里积压的小包合并成一次系统调用发送，队列满时调用方会收到 SendQueueFull，
+    发送失败时丢弃积压的包并通过 on_error 通知所属连接
+    """
+
+    def __init__(self,client:socket.socket,maxsize:int=None,on_error=None) -> None:
+        self.client = client
+        # 发送失败回调，参数为异常
+        self.on_error = on_error
+        # 为空时跟随 config.SEND_QUEUE_SIZE
+        self.queue = queue.Queue(maxsize if maxsize is not None else config.SEND_QUEUE_SIZE)
+        # 是否关闭
+        self.is_close = False
+        # 发送线程
+        self.send_thread = None
+
+    def start(self):
+        self.send_thread = threading.Thread(target=self._run,daemon=True)
+        self.send_thread.start()
+        return self
+
+    def put(self,pkg:bytes,timeout:float=None) -> int:
+        """把打包好的请求放入发送队列
+
+        Args:
+            pkg (bytes): 总包
+            timeout (float, optional): 队列满时最多等待的秒数. Defaults to config.SEND_QUEUE_TIMEOUT.
+
+        Raises:
+            SendQueueFull: 队列已满或者连接已关闭
+
+        Returns:
+            int: 包大小
+        """
+        if self.is_close: raise SendQueueFull("writer is closed")
+        if timeout is None: timeout = config.SEND_QUEUE_TIMEOUT
+        try:
+            self.queue.put(pkg,timeout=timeout)
+        except queue.Full:
+            raise SendQueueFull("send queue is full, %d frames pending" % self.queue.qsize())
+        return len(pkg)
+
+    def qsize(self) -> int:
+        """待发送的包数量
+        """
+        return self.queue.qsize()
+
+    def full(self) -> bool:
+        return self.queue.full()
+
+    def close(self):
+        self.is_close = True
+        try:
+            # 唤醒发送线程
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def _run(self):
+        while not self.is_close:
+            pkg = self.queue.get()
+            if pkg is None: break
+            batch = [pkg]
+            size = len(pkg)
+            # 合并已经排队的小包
+            while size<config.SEND_COALESCE_SIZE:
+                try:
+                    pkg = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if pkg is None:
+                    self.is_close = True
+                    break
+                batch.append(pkg)
+                size += len(pkg)
+            try:
+                self.client.sendall(batch[0] if len(batch)==1 else b"".join(batch))
+            except socket.error as ex:
+                if self.is_close: break
+                self.is_close = True
+                logger.error("send fails, %d frames dropped: %s" % (len(batch)+self.__drain(),ex))
+                if self.on_error: self.on_error(ex)
+
+    def __drain(self) -> int:
+        """丢弃队列里还没有发送的包
+
+        Returns:
+            int: 丢弃的包数量
+        """
+        count = 0
+        while True:
+            try:
+                pkg = self.queue.get_nowait()
+            except queue.Empty:
+                return count
+            if pkg is not None: count += 1
@@ -42,3 +42,15 @@ class QuoteModel(object):
         self.pbr: float = None
         self.per: float = None
 
+
+# 行情字段对应的 numpy 类型，字符串使用 object
+QUOTE_DTYPES = {
+    "name":"O","code":"O","lastdate":"O","lasttime":"O",
+    "price":"f8","last":"f8","open":"f8","high":"f8","low":"f8",
+    "buy_1":"f8","buy_2":"f8","buy_3":"f8","buy_4":"f8","buy_5":"f8",
+    "sell_1":"f8","sell_2":"f8","sell_3":"f8","sell_4":"f8","sell_5":"f8",
+    "buy_1_v":"i8","buy_2_v":"i8","buy_3_v":"i8","buy_4_v":"i8",
+    "sell_1_v":"i8","sell_2_v":"i8","sell_3_v":"i8","sell_4_v":"i8",
+    "vol":"i8","amount":"f8","ampl":"f8","flow":"f8","total":"f8",
+    "tr":"f8","pbr":"f8","per":"f8",
+}
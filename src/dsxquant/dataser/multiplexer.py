@@ -0,0 +1,103 @@
+import socket
+import threading
+import traceback
+from concurrent.futures import Future
+from dsxquant.dataser.frame_reader import FrameReader
+from dsxquant.config.logconfig import logger
+from dsxquant.dataser.parser.base import ResponseRecvFails
+
+
+class Multiplexer(object):
+    """单连接多路复用
+    由一个读线程接收服务器返回，按 request_id 分发给对应请求的 Future，
+    这样多个请求可以在同一个连接上连续发送，不必一个一个等待返回
+    """
+
+    def __init__(self,frame_reader:FrameReader) -> None:
+        self.frame_reader = frame_reader
+        # 等待返回的请求 {request_id:(api_name,Future)}
+        self.pending = {}
+        self.lock = threading.Lock()
+        # 是否关闭
+        self.is_close = False
+        # 接收线程
+        self.recv_thread = None
+
+    def start(self):
+        self.recv_thread = threading.Thread(target=self._recv,daemon=True)
+        self.recv_thread.start()
+        return self
+
+    def register(self,request_id,api_name:str) -> Future:
+        """登记一个等待返回的请求，必须在发送之前登记
+
+        Args:
+            request_id (int): 请求ID
+            api_name (str): 接口名称
+
+        Returns:
+            Future: 收到返回后完成，结果为服务器返回的字典
+        """
+        future = Future()
+        with self.lock:
+            if self.is_close:
+                future.set_exception(ResponseRecvFails("connection closed"))
+            else:
+                self.pending[str(request_id)] = (api_name,future)
+        return future
+
+    def discard(self,request_id):
+        """放弃等待某个请求，之后到达的返回会被丢弃
+        """
+        with self.lock:
+            self.pending.pop(str(request_id),None)
+
+    def close(self):
+        self.is_close = True
+        self.__fail_all()
+
+    def __match(self,body_info:dict) -> Future:
+        request_id = body_info.get("request_id")
+        with self.lock:
+            if request_id is not None:
+                item = self.pending.pop(str(request_id),None)
+                return item and item[1]
+            # 没有带 request_id 的返回，按接口名称匹配最早发出的请求
+            act = body_info.get("act")
+            for rid,(api_name,future) in self.pending.items():
+                if api_name==act:
+                    del self.pending[rid]
+                    return future
+
+    def __fail_all(self):
+        with self.lock:
+            pending = list(self.pending.values())
+            self.pending.clear()
+        for api_name,future in pending:
+            if not future.done():
+                future.set_exception(ResponseRecvFails("connection closed"))
+
+    def _recv(self):
+        """循环接收服务器返回并按请求分发
+        """
+        while not self.is_close:
+            try:
+                body_info = self.frame_reader.recv()
+                if body_info is None:
+                    # 服务器关闭连接后会返回数据长度为0
+                    break
+                future = self.__match(body_info)
+                if future:
+                    if not future.done(): future.set_result(body_info)
+                else:
+                    logger.debug("drop unmatched response act=%s request_id=%s" % (body_info.get("act"),body_info.get("request_id")))
+            except socket.timeout:
+                # 连接空闲或者帧读取到一半，已读取部分保留在 frame_reader 中，继续读取不会错位
+                continue
+            except socket.error as ex:
+                if not self.is_close: logger.error(ex)
+                break
+            except Exception as ex:
+                logger.error(traceback.format_exc())
+        self.is_close = True
+        self.__fail_all()
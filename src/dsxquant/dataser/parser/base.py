@@ -4,16 +4,19 @@ import struct
 import threading
 import time
 import traceback
+from concurrent.futures import Future,TimeoutError as FutureTimeoutError
 from dsxquant.config.logconfig import logger
-from dsxquant.common import fn
+from dsxquant.common import fn,codec
 from dsxquant.config import config
-import gzip
 import pandas
 from typing import Union,TypeVar,Callable
 
 from dsxquant.common.json2model import Json2Model
 from dsxquant.dataser.models.result import ResultModel
 from dsxquant.common.cache import CacheHelper
+from dsxquant.dataser.frame_reader import FrameReader,unpack
+from dsxquant.dataser.compress import CompressPolicy
+from dsxquant.dataser.frame_writer import SendQueueFull
 
 T = TypeVar("T")
 
@@ -36,9 +39,15 @@ class BaseParser(object):
     # 锁，主要是发送数据的时候防止并发
     lock = threading.Lock()
     reclock = threading.Lock()
+    # 默认压缩策略
+    default_compress_policy = CompressPolicy()
 
-    def __init__(self, client:socket.socket,sync:bool=True,callback=None):
+    def __init__(self, client:socket.socket,sync:bool=True,callback=None,conn=None):
         self.client = client
+        # 所属连接 DsxDataser
+        self.conn = conn
+        # 多路复用模式下等待返回的 Future
+        self._future:Future = None
         # 发送数据字符串
         self.send_datas = None
         # 发送包
@@ -61,6 +70,8 @@ class BaseParser(object):
         self.cache = None
         # 是否开启缓存
         self.enable_cache = False
+        # 订阅推送合并，回调来不及处理时只保留最新的推送
+        self.conflate = False
         # 设置好api的名称
         self.setApiName()
         
@@ -92,6 +103,18 @@ class BaseParser(object):
     def parseResponse(self, datas):
         pass
 
+    def merge(self,pending:dict,datas:dict) -> dict:
+        """合并订阅推送，conflate 模式下新推送到达时还有未回调的推送会调用此方法
+
+        Args:
+            pending (dict): 还未回调的推送
+            datas (dict): 新到达的推送
+
+        Returns:
+            dict: 合并后的推送，默认只保留最新的推送
+        """
+        return datas
+
     def setup(self):
         pass
 
@@ -103,20 +126,38 @@ class BaseParser(object):
         return self.call_api()
 
     def call_api(self):
+        """发送请求，同步模式下等待返回
+
+        Raises:
+            SendQueueFull: 发送队列已满或者连接已经关闭
+
+        Returns:
+            BaseParser: 返回实例本身
+        """
         # logger.debug("执行base统一发送方法")
         result = None
         try:
+            multiplexer = self.conn and self.conn.multiplexer
+            if self.sync and multiplexer and not self.cache:
+                # 多路复用模式，发送后直接返回，结果由读线程按request_id送达
+                return self._call_api_multiplex(multiplexer)
             if self.sync:
                 self._send()
                 result = self._call_api()
             else:
-                # 异步send
-                threading.Thread(target=self._send).start()
+                # 异步send，放入连接的发送队列后立即返回
+                self._send()
 
         except SocketClientNotReady as ex:
             logger.error(ex)
         except SendRequestPkgFails as ex:
             logger.error(ex)
+        except SendQueueFull as ex:
+            # 发送队列满是给调用方的反压，交给调用方决定等待、重试还是丢弃
+            if self._future is not None and multiplexer:
+                multiplexer.discard(self.request_id)
+                self._future = None
+            raise ex
         except ResponseRecvFails as ex:
             logger.error(ex)
         except ResponseHeaderRecvFails as ex:
@@ -127,35 +168,130 @@ class BaseParser(object):
             logger.error(ex)
         self.result = result
         return self
+
+    def _call_api_multiplex(self,multiplexer):
+        self._future = multiplexer.register(self.request_id,self.api_name)
+        self._send()
+        if self.send_result != len(self.send_pkg):
+            multiplexer.discard(self.request_id)
+            self._future = None
+            raise SendRequestPkgFails("send fails")
+        return self
+
+    @property
+    def result(self) -> dict:
+        if self._future is not None: self.wait()
+        return self._result
+
+    @result.setter
+    def result(self,value:dict):
+        self._result = value
+
+    def wait(self,timeout:float=None):
+        """多路复用模式下等待服务器返回，读取 result 时也会自动等待
+
+        Args:
+            timeout (float, optional): 超时秒数. Defaults to config.CONNECT_TIMEOUT.
+
+        Returns:
+            BaseParser: 返回实例本身
+        """
+        future = self._future
+        if future is None: return self
+        self._future = None
+        result = None
+        try:
+            datas = future.result(timeout or config.CONNECT_TIMEOUT)
+            result = self.parseResponse(datas)
+        except FutureTimeoutError as ex:
+            if self.conn and self.conn.multiplexer: self.conn.multiplexer.discard(self.request_id)
+            logger.error(ResponseRecvFails("socket timeout"))
+        except ResponseRecvFails as ex:
+            # 连接断开时多路复用器用它结束所有等待的请求
+            logger.error(ex)
+        except ResponseHeaderRecvFails as ex:
+            logger.error(ex)
+        except SendRequestPkgFails as ex:
+            logger.error(ex)
+        except SocketClientNotReady as ex:
+            logger.error(ex)
+        except json.JSONDecodeError as ex:
+            logger.error(ex)
+        except Exception as ex:
+            logger.error(ex)
+        self._result = result
+        return self
+
+    def pack(self) -> bytearray:
+        """按协议打包请求数据 头部(是否压缩,包大小)+包体
+
+        Returns:
+            bytearray: 总包
+        """
+        # 设置一些公共信息
+        self.setup()
+        # 第一步：将json格式的数据直接编码为二进制数据
+        body_pkg = not self.send_datas == None and codec.dumpb(self.send_datas) or b''
+        enable_zip = False
+        if(self.send_datas != None):
+            # 按连接的压缩策略压缩，小包不压缩
+            enable_zip,body_pkg = self.compress_policy.compress(body_pkg)
+        # 第二步：使用python中struct模块对数据的长度进行编码为固定长度的数据，这是struct模块的特点，能将任何长度的数据编码为固定长度的数据
+        send_size = len(body_pkg)
+        # 头包
+        header_pkg = struct.pack(config.PACK_TYPE, (enable_zip and 1 or 0), send_size)
+        # 总包
+        self.send_pkg = bytearray()
+        # 组装完成
+        self.send_pkg.extend(header_pkg)
+        self.send_pkg.extend(body_pkg)
+        return self.send_pkg
+
+    @staticmethod
+    def unpack(enable_zip:bool,body_buf) -> dict:
+        """解包返回数据
+
+        Args:
+            enable_zip (bool): 头部压缩标识
+            body_buf (bytes): 包体
+
+        Returns:
+            dict: 返回的json字典信息
+        """
+        return unpack(enable_zip,body_buf)
+
+    @property
+    def compress_policy(self) -> CompressPolicy:
+        """连接的压缩策略，没有所属连接时使用默认策略
+        """
+        if self.conn and self.conn.compress_policy: return self.conn.compress_policy
+        return BaseParser.default_compress_policy
+
+    @property
+    def frame_reader(self) -> FrameReader:
+        """连接的帧读取器，没有所属连接时临时创建一个
+        """
+        if self.conn and self.conn.frame_reader: return self.conn.frame_reader
+        return FrameReader(self.client)
+
     def _send(self):
         if self.cache: return
         try:
+            frame_writer = self.conn and self.conn.frame_writer
+            if frame_writer:
+                # 交给连接的发送线程，队列满时抛出 SendQueueFull
+                self.send_result = frame_writer.put(self.pack())
+                return
             with BaseParser.lock:
-                # 设置一些公共信息
-                self.setup()
-                # 第一步：将json格式的数据转换为字符串
-                body_info = not self.send_datas == None and json.dumps(self.send_datas) or ''
-                # 第二步：对数据body_info进行编码为二进制数据
-                body_pkg = body_info.encode('utf-8')
-                if(self.send_datas != None and config.ENABLE_GZIP):
-                    # logger.debug("ungzip size:%d",len(body_pkg))
-                    # logger.debug(body_pkg)
-                    body_pkg = gzip.compress(body_pkg)
-                    # logger.debug("gzip size:%d",len(body_pkg))
-                # 第三步：使用python中struct模块对数据的长度进行编码为固定长度的数据，这是struct模块的特点，能将任何长度的数据编码为固定长度的数据
-                send_size = len(body_pkg)
-                # 头包
-                header_pkg = struct.pack(config.PACK_TYPE, (config.ENABLE_GZIP==True and 1 or 0), send_size)
-                # 总包
-                self.send_pkg = bytearray()
-                # 组装完成
-                self.send_pkg.extend(header_pkg)
-                self.send_pkg.extend(body_pkg)
+                self.pack()
                 # logger.debug("_send:%s" % self.send_pkg)
                 if self.client==None:
                     return SocketClientNotReady("client is none")
-                # 发送包成功返回包大小
-                self.send_result = self.client.send(self.send_pkg)
+                # 发送完整个包，成功返回包大小
+                self.client.sendall(self.send_pkg)
+                self.send_result = len(self.send_pkg)
+        except SendQueueFull as ex:
+            raise ex
         except socket.error as ex:
             pass
         except Exception as ex:
@@ -177,32 +313,14 @@ class BaseParser(object):
         else:
             try:
                 with BaseParser.reclock:
-                    # 接收客户端发送过来的数据，因为使用了struct模块中"i"模式，它对任何长度的数据加密出来的长度为固定4字节，所以接收这里使用4
-                    head_buf = self.client.recv(self.rsp_header_len)
-                    if len(head_buf) == self.rsp_header_len:
-                        # 解包头部长度
-                        header_size = struct.unpack(config.PACK_TYPE, head_buf)
-                        config.ENABLE_GZIP = bool(header_size[0])
-                        body_size = header_size[1]
-                        body_buf = bytearray()
-                        body_len = len(body_buf)
-                        while body_len<body_size:
-                            b_buf = self.client.recv(body_size-body_len)
-                            body_buf.extend(b_buf)
-                            body_len = len(body_buf)
-                        if config.ENABLE_GZIP:
-                            body_buf = gzip.decompress(body_buf)
-                        # 解码字符串
-                        body_info = body_buf.decode('utf-8')
-                        
-                        # 还原json字典信息
-                        body_info = json.loads(body_info)
-                        
+                    # 按协议读取一帧，数据直接写入连接复用的缓冲区
+                    frame_reader = self.frame_reader
+                    body_info = frame_reader.recv()
+                    if body_info is not None:
                         # logger.debug(body_info)
                         return self.parseResponse(body_info)
                     else:
                         logger.error("head_buf is not 0x4")
-                        logger.error(head_buf)
                         raise ResponseHeaderRecvFails("head_buf is not 0x4")
 
             except socket.timeout as ex:
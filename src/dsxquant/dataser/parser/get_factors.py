@@ -1,4 +1,5 @@
 from dsxquant.dataser.parser.base import BaseParser
+from dsxquant.common.cache import CacheHelper
 class GetFactorsParser(BaseParser):
 
     def setApiName(self):
@@ -10,6 +11,8 @@ class GetFactorsParser(BaseParser):
             symbol (str): 证券代码
             market (int): 市场代码
         """
+        self.symbol = symbol
+        self.market = market
         datas = self.transdata({
             "symbol":symbol,
             "market":market
@@ -25,6 +28,9 @@ class GetFactorsParser(BaseParser):
         """
 
         # logger.debug("parseResponse  "+__name__+" ")
+        # 缓存复权因子，本地计算复权K线时使用
+        if datas and datas.get("success"):
+            CacheHelper.save_factors(self.symbol,self.market,datas.get("data") or {})
 
         return datas
 
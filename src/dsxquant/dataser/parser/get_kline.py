@@ -1,6 +1,11 @@
+import datetime
+import inspect
 from dsxquant.dataser.parser.base import BaseParser
+from dsxquant.config import config
+from dsxquant.config.logconfig import logger
 from dsxquant.config.config import FQ,CYCLE,MARKET_VAL
 from dsxquant.common.cache import CacheHelper
+from dsxquant.common.kline_resample import RESAMPLE_RATIO
 class GetKlinesParser(BaseParser):
 
     def setApiName(self):
@@ -25,20 +30,130 @@ class GetKlinesParser(BaseParser):
             if not symbol[0:2].isdigit():
                 market = MARKET_VAL.index(symbol[0:2])
                 symbol = symbol[2:]
+        # 本地复权时只请求和缓存不复权的K线
+        self.local_fq = self.enable_cache and CacheHelper.local_fq(fq) and self.factors_ready(symbol,market)
+        self.source_fq = FQ.DEFAULT if self.local_fq else fq
+        # 本地合成周期时请求基础周期，从最新开始覆盖到要求的页
+        self.source_cycle = CacheHelper.kline_cycle(cycle) if self.enable_cache else cycle
+        self.resample = self.source_cycle!=cycle
+        request_page,request_size = page,page_size
+        if self.resample:
+            request_page,request_size = 1,min(page*page_size*RESAMPLE_RATIO[cycle],config.KLINE_SYNC_PAGE_SIZE)
 
         datas = self.transdata({
             "symbol":symbol,
             "market":market,
-            "page":page,
-            "page_size":page_size,
-            "fq":fq,
-            "cycle":cycle,
+            "page":request_page,
+            "page_size":request_size,
+            "fq":self.source_fq,
+            "cycle":self.source_cycle,
             "start":start,
             "end":end
         })
         self.send_datas = datas
+        self.request_size = request_size if request_page==1 and not start and not end else None
+        # 合成周期时一页基础周期K线不够，返回后继续往前翻页
+        self.more_pages = False
+        # 增量同步时从这个日期开始请求
+        self.sync_from = None
+        self.query = (page,page_size,start,end)
         if self.enable_cache:
             self.cache = CacheHelper.get_klines(symbol,market,page,page_size,fq,cycle,start,end)
+            # 缓存过期但是本来就包含要求的页时才增量同步，否则按原来的参数请求
+            if self.cache is None and not end and config.KLINE_SYNC_INCREMENTAL and CacheHelper.klines_cover(symbol,market,page,page_size,fq,cycle,start):
+                self.incremental(symbol,market,self.source_fq,self.source_cycle)
+
+    def incremental(self,symbol:str,market:int,fq:str,cycle:CYCLE):
+        """缓存不是今天的时，只请求最后缓存日期之后的K线，返回后追加到缓存，再按原来的参数从缓存读取
+
+        Args:
+            symbol (str): 证券代码，不带市场前缀
+            market (int): 市场代码
+            fq (str): 复权类型
+            cycle (CYCLE): 周期
+        """
+        last = CacheHelper.get_klines_last_date(symbol,market,fq,cycle)
+        if last is None: return
+        day = str(last)[:8]
+        try:
+            days = (datetime.date.today()-datetime.datetime.strptime(day,"%Y%m%d").date()).days
+        except ValueError:
+            return
+        if days>config.KLINE_SYNC_MAX_DAYS: return
+        if fq==FQ.QFQ and self.factors_changed(symbol,market,day):
+            # 有新的除权除息，前复权的历史K线都变了，重新请求整页
+            CacheHelper.remove_klines(symbol,market,fq,cycle)
+            return
+        self.sync_from = day
+        self.send_datas["params"].update({
+            "page":1,
+            "page_size":config.KLINE_SYNC_PAGE_SIZE,
+            "start":day,
+            "end":None
+        })
+
+    def call_api(self):
+        super().call_api()
+        # 多路复用模式在 wait 返回后翻页
+        if self._future is None: self.request_pages()
+        return self
+
+    def wait(self,timeout:float=None):
+        super().wait(timeout)
+        self.request_pages()
+        return self
+
+    def request_pages(self):
+        """合成周期时按同样的每页大小往前请求基础周期K线，直到缓存够到要求的页或者已经是上市以来的全部K线，
+        最后从缓存重新读取，不能同步请求时返回已有的部分
+        """
+        if not self.more_pages: return
+        self.more_pages = False
+        # 异步模式下无法同步翻页
+        if self.conn is None or not self.sync or inspect.iscoroutinefunction(self.conn.get_klines): return
+        page,page_size,start,end = self.query
+        request_page = 1
+        while not CacheHelper.klines_cover(self.symbol,self.market,page,page_size,self.fq,self.cycle):
+            request_page += 1
+            result = self.conn.get_klines(self.symbol,self.market,request_page,self.request_size,self.source_fq,self.source_cycle)
+            result = result and result.result
+            if not result or not result.get("success"): break
+            if len(result.get("data") or [])<self.request_size:
+                # 已经翻到第一根K线
+                CacheHelper.set_klines_complete(self.symbol,self.market,self.source_fq,self.source_cycle)
+                break
+        cache = CacheHelper.get_klines(self.symbol,self.market,page,page_size,self.fq,self.cycle,partial=True)
+        if cache is not None and self._result: self._result["data"] = cache
+
+    def factors_ready(self,symbol:str,market:int) -> bool:
+        """本地复权需要今天缓存的复权因子，复权因子由连接的 load_factors 在请求K线前加载，这里不请求网络
+
+        Returns:
+            bool: 复权因子是否可用，不可用时使用服务器复权
+        """
+        if CacheHelper.get_factors(symbol,market) is not None: return True
+        logger.info("factors of %s not cached, skip local fq and use server fq" % symbol)
+        return False
+
+    def factors_changed(self,symbol:str,market:int,day:str) -> bool:
+        """最后缓存日期之后是否有新的复权因子，只读取今天缓存的复权因子
+
+        Args:
+            day (str): 最后缓存日期 YYYYMMDD
+
+        Returns:
+            bool: 有新的复权因子或者无法确定时返回True
+        """
+        data = CacheHelper.get_factors(symbol,market)
+        if data is None: return True
+        if isinstance(data,dict):
+            dates = data.keys()
+        else:
+            dates = [item.split(",")[0] if isinstance(item,str) else item[0] for item in data]
+        for date in dates:
+            date = "".join(c for c in str(date) if c.isdigit())[:8]
+            if date>day: return True
+        return False
         
     
     def parseResponse(self, datas):
@@ -51,9 +166,29 @@ class GetKlinesParser(BaseParser):
         # 保存缓存数据
         if datas and self.enable_cache:
             if datas["success"]:
-                data = datas["data"]
-                if data:
-                    CacheHelper.save_klines(self.symbol,self.market,self.cycle,self.fq,data)
+                data = datas["data"] or []
+                # 第一页不满说明已经是上市以来的全部K线
+                complete = not self.sync_from and self.request_size and len(data)<self.request_size
+                if data or self.sync_from or complete:
+                    # 增量同步没有新K线也要标记今天已经缓存，最后一根K线可能是盘中数据，用新数据覆盖
+                    CacheHelper.save_klines(self.symbol,self.market,self.source_cycle,self.source_fq,data,bool(self.sync_from))
+                if complete:
+                    CacheHelper.set_klines_complete(self.symbol,self.market,self.source_fq,self.source_cycle)
+                cache = None
+                if self.sync_from or self.resample:
+                    # 按原来的参数从缓存读取，需要时复权、合成周期，缓存不够一页时返回已有的部分
+                    page,page_size,start,end = self.query
+                    cache = CacheHelper.get_klines(self.symbol,self.market,page,page_size,self.fq,self.cycle,start,end,partial=True)
+                if self.resample and not complete and self.request_size and len(data)>=self.request_size:
+                    page,page_size,start,end = self.query
+                    self.more_pages = not CacheHelper.klines_cover(self.symbol,self.market,page,page_size,self.fq,self.cycle)
+                if cache is not None:
+                    datas["data"] = cache
+                elif self.resample:
+                    # 没有写入缓存时不能把基础周期的K线返回给调用方
+                    datas["data"] = []
+                elif data and self.local_fq:
+                    datas["data"] = CacheHelper.adjust_klines(self.symbol,self.market,self.fq,data)
 
         # logger.debug("parseResponse  "+__name__+"  ")
         return datas
@@ -1,4 +1,49 @@
 from dsxquant.dataser.parser.base import BaseParser
+
+
+def merge_quotes(pending:dict,datas:dict) -> dict:
+    """按证券代码合并两次行情推送，同一个代码只保留最新的快照
+
+    支持的数据格式：
+        [{"code":..},...] 行情字典数组
+        [["code",...],[...],...] 第一行为字段名称，第二行开始是行情
+        {code:{...}} 按代码索引的行情
+
+    Args:
+        pending (dict): 还未回调的推送
+        datas (dict): 新到达的推送
+
+    Returns:
+        dict: 合并后的推送，其他字段取最新的推送
+    """
+    if not pending or not datas or not pending.get("success") or not datas.get("success"):
+        return datas
+    old = pending.get("data")
+    new = datas.get("data")
+    merged = None
+    if isinstance(old,dict) and isinstance(new,dict):
+        merged = dict(old)
+        merged.update(new)
+    elif isinstance(old,list) and isinstance(new,list) and old and new:
+        if isinstance(old[0],dict) and isinstance(new[0],dict):
+            quotes = {}
+            for item in old+new:
+                quotes[item.get("code")] = item
+            merged = list(quotes.values())
+        elif isinstance(old[0],list) and old[0]==new[0] and "code" in new[0]:
+            # 第一行是字段名称
+            index = new[0].index("code")
+            quotes = {}
+            for item in old[1:]+new[1:]:
+                quotes[item[index]] = item
+            merged = [new[0]] + list(quotes.values())
+    if merged is None:
+        return datas
+    datas = dict(datas)
+    datas["data"] = merged
+    return datas
+
+
 class GetQuotesParser(BaseParser):
 
     def setApiName(self):
@@ -28,5 +73,5 @@ class GetQuotesParser(BaseParser):
 
         return datas
 
-
-        
\ No newline at end of file
+    def merge(self,pending:dict,datas:dict) -> dict:
+        return merge_quotes(pending,datas)
@@ -24,7 +24,7 @@ class GetShareBonusParser(BaseParser):
         })
         self.send_datas = datas
         if self.enable_cache:
-            self.cache = CacheHelper.save_sharebonus(symbol,market,start,end)
+            self.cache = CacheHelper.get_sharebonus(symbol,market,start,end)
         
         
     
@@ -1,6 +1,7 @@
-import datetime
 from dsxquant.dataser.parser.base import BaseParser
+from dsxquant.config import config
 from dsxquant.common.cache import CacheHelper
+from dsxquant.common.trade_calendar import TradeCalendar
 class GetTransListParser(BaseParser):
 
     def setApiName(self):
@@ -19,6 +20,9 @@ class GetTransListParser(BaseParser):
         self.trade_date = trade_date
         self.page = page
         self.page_size = page_size
+        # 缓存的交易日，没有指定时为当前交易日
+        self.cache_date = (trade_date or TradeCalendar.get_instance().trade_date()).replace("-","")
+        self.request_size = page_size
         datas = self.transdata({
             "symbol":symbol,
             "market":market,
@@ -28,7 +32,16 @@ class GetTransListParser(BaseParser):
         })
         self.send_datas = datas
         if self.enable_cache:
-            self.cache = CacheHelper.get_translist(symbol,market,trade_date,page,page_size)
+            self.cache = CacheHelper.get_translist(symbol,market,self.cache_date,page,page_size)
+            if self.cache is None:
+                # 缓存够用时只同步最新的一段，否则请求一整天，都从第一页开始保证和最新数据相接
+                cache = CacheHelper.get_translist_cache(symbol,market,self.cache_date,False)
+                count = cache and cache["columns"] and len(cache["columns"][0]) or 0
+                if count and (cache["complete"] or page*page_size<=count):
+                    self.request_size = config.TRANSLIST_SYNC_SIZE
+                else:
+                    self.request_size = config.TRANSLIST_DAY_SIZE
+                datas["params"].update({"page":1,"page_size":self.request_size})
     
     def parseResponse(self, datas):
         """解析返回的数据
@@ -41,10 +54,10 @@ class GetTransListParser(BaseParser):
         # 保存缓存数据
         if datas and self.enable_cache:
             if datas["success"]:
-                data = datas["data"]
-                if data:
-                    if not self.trade_date:self.trade_date = datetime.datetime.now().strftime("%Y%m%d")
-                    CacheHelper.save_translist(self.symbol,self.market,self.trade_date,data,self.page,self.page_size)
+                data = datas["data"] or []
+                CacheHelper.save_translist(self.symbol,self.market,self.cache_date,data,1,self.request_size)
+                # 按原来的页码从缓存读取
+                datas["data"] = CacheHelper.get_translist(self.symbol,self.market,self.cache_date,self.page,self.page_size,False) or []
 
         return datas
 
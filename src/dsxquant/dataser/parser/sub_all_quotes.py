@@ -1,8 +1,13 @@
 from dsxquant.dataser.parser.base import BaseParser
+from dsxquant.dataser.parser.get_quotes import merge_quotes
+from dsxquant.dataser.quotes_decoder import QuotesDecoder
+import numpy
 class SubAllQuotesParser(BaseParser):
 
     def setApiName(self):
         self.api_name = "suballquotes"
+        # 推送解码器，字段名称在推送之间缓存
+        self.decoder = QuotesDecoder()
     
     def setParams(self,):
         #print(symbols)
@@ -23,5 +28,24 @@ class SubAllQuotesParser(BaseParser):
 
         return datas
 
+    def merge(self,pending:dict,datas:dict) -> dict:
+        return merge_quotes(pending,datas)
 
-        
\ No newline at end of file
+    def columns(self) -> dict:
+        """推送转成按字段名称索引的 numpy 列，不经过 pandas
+
+        Returns:
+            dict: {字段名称:numpy.ndarray}
+        """
+        if self.result and self.result.get("success"):
+            return self.decoder.columns(self.result.get("data"))
+        return {}
+
+    def numpy(self) -> numpy.ndarray:
+        """推送转成 numpy 结构化数组，字段为 QuoteModel 的字段
+
+        Returns:
+            numpy.ndarray: 结构化数组，没有数据返回None
+        """
+        if self.result and self.result.get("success"):
+            return self.decoder.records(self.result.get("data"))
@@ -0,0 +1,93 @@
+import numpy
+from dsxquant.dataser.models.quotes import QUOTE_DTYPES
+
+
+def _infer(value) -> str:
+    """推断不在 QuoteModel 中的字段类型
+    """
+    if isinstance(value,bool): return "?"
+    if isinstance(value,int): return "i8"
+    if isinstance(value,float): return "f8"
+    return "O"
+
+
+class QuotesDecoder(object):
+    """全市场行情推送解码
+    推送数据第一行是字段名称，第二行开始是行情，直接按列转成 numpy 数组，
+    字段名称和列类型在推送之间缓存，字段名称不变时不再重新解析
+
+    decoder = QuotesDecoder()
+    columns = decoder.columns(response.result["data"])
+    columns["code"][columns["price"].argmax()]
+    """
+
+    def __init__(self) -> None:
+        # 最近一次的字段名称
+        self.header:list = None
+        # 每列的类型
+        self.dtypes:list = None
+        # 结构化数组类型
+        self.__dtype:numpy.dtype = None
+
+    def __prepare(self,header:list,row:list):
+        if header==self.header: return
+        self.header = list(header)
+        self.dtypes = [QUOTE_DTYPES.get(name) or _infer(row[i] if row and i<len(row) else None) for i,name in enumerate(self.header)]
+        self.__dtype = None
+
+    def __column(self,i:int,values:tuple) -> numpy.ndarray:
+        while True:
+            try:
+                if self.dtypes[i]=="i8":
+                    # 指定 i8 时小数会被直接截断，先按值推断类型，全是整数时才用 i8
+                    column = numpy.array(values)
+                    if column.dtype.kind not in "biu": raise TypeError("column %s is not integer" % self.header[i])
+                    return column.astype(numpy.int64,copy=False)
+                return numpy.array(values,dtype=self.dtypes[i])
+            except (TypeError,ValueError,OverflowError):
+                # 有空值或者类型不符时放宽类型 i8 -> f8 -> O，并记住放宽后的类型
+                self.dtypes[i] = self.dtypes[i]=="i8" and "f8" or "O"
+                self.__dtype = None
+
+    @property
+    def dtype(self) -> numpy.dtype:
+        """结构化数组类型，字段顺序和推送一致
+        """
+        if self.__dtype is None and self.header:
+            self.__dtype = numpy.dtype(list(zip(self.header,self.dtypes)))
+        return self.__dtype
+
+    def columns(self,data:list) -> dict:
+        """解码成按字段名称索引的列
+
+        Args:
+            data (list): 推送的 data，第一行为字段名称
+
+        Returns:
+            dict: {字段名称:numpy.ndarray}，不是表格数据时返回空字典
+        """
+        if not data or not isinstance(data[0],list): return {}
+        rows = data[1:]
+        self.__prepare(data[0],rows and rows[0] or None)
+        if not rows:
+            return {name:numpy.empty(0,dtype=self.dtypes[i]) for i,name in enumerate(self.header)}
+        # 行转列在 C 层完成
+        return {name:self.__column(i,values) for i,(name,values) in enumerate(zip(self.header,zip(*rows)))}
+
+    def records(self,data:list) -> numpy.ndarray:
+        """解码成结构化数组
+
+        Args:
+            data (list): 推送的 data，第一行为字段名称
+
+        Returns:
+            numpy.ndarray: 结构化数组，不是表格数据时返回None
+        """
+        columns = self.columns(data)
+        if not columns: return None
+        size = len(data)-1
+        dtype = self.dtype
+        records = numpy.empty(size,dtype=dtype)
+        for name,values in columns.items():
+            if len(values)==size: records[name] = values
+        return records
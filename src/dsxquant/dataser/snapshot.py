@@ -0,0 +1,315 @@
+import datetime
+import threading
+import numpy
+import pandas
+from dsxquant.dataser.quotes_decoder import QuotesDecoder
+
+# A股每天交易分钟数
+TRADE_MINUTES = 240
+
+
+def trade_minutes(now:datetime.datetime=None) -> int:
+    """当天已经交易的分钟数，按 9:30-11:30 13:00-15:00 计算
+
+    Args:
+        now (datetime.datetime, optional): 时间. Defaults to 当前时间.
+
+    Returns:
+        int: 已交易分钟数 1-240
+    """
+    now = now or datetime.datetime.now()
+    minutes = now.hour*60+now.minute
+    if minutes<=9*60+30: return 1
+    if minutes<=11*60+30: return minutes-(9*60+30)
+    if minutes<=13*60: return 120
+    if minutes<=15*60: return 120+minutes-13*60
+    return TRADE_MINUTES
+
+
+class _Group(object):
+    """分组标签，按分组名称编号后保存每行的编号，聚合时直接 bincount
+    """
+
+    def __init__(self,mapping:dict,capacity:int) -> None:
+        self.mapping = mapping
+        self.names = []
+        self.index = {}
+        self.labels = numpy.full(capacity,-1,dtype=numpy.int32)
+
+    def label(self,code) -> int:
+        name = self.mapping.get(code)
+        if name is None: return -1
+        i = self.index.get(name)
+        if i is None:
+            i = self.index[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+
+class MarketSnapshot(object):
+    """全市场行情快照
+    每个证券一行，字段按列预分配 numpy 数组，每次推送按代码原地更新，
+    筛选、排序、分组聚合直接在列上向量化计算，不再每次重建 DataFrame
+
+    snapshot = MarketSnapshot()
+    dd.sub_all_quotes(snapshot.on_quotes)
+    snapshot.top(10,"change")
+    snapshot.select(tr=(5,None),volume_ratio=(2,None))
+
+    Args:
+        capacity (int, optional): 预分配行数，不够时自动扩容. Defaults to 8192.
+    """
+
+    def __init__(self,capacity:int=8192) -> None:
+        self.capacity = capacity
+        # 已有的证券数量
+        self.size = 0
+        # 代码 -> 行号
+        self.index = {}
+        self.codes = numpy.empty(capacity,dtype=object)
+        # 字段列 {字段名称:numpy.ndarray}
+        self.columns = {}
+        # 分组 {分组名称:_Group}
+        self.groups = {}
+        # 推送解码器
+        self.decoder = QuotesDecoder()
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return self.size
+
+    def __grow(self,size:int):
+        capacity = self.capacity
+        while capacity<size: capacity *= 2
+        if capacity==self.capacity: return
+        def grow(array:numpy.ndarray,fill):
+            new = numpy.full(capacity,fill,dtype=array.dtype)
+            new[:self.size] = array[:self.size]
+            return new
+        self.codes = grow(self.codes,None)
+        for name,column in self.columns.items():
+            self.columns[name] = grow(column,column.dtype.kind=="f" and numpy.nan or None)
+        for group in self.groups.values():
+            group.labels = grow(group.labels,-1)
+        self.capacity = capacity
+
+    def __rows(self,codes) -> numpy.ndarray:
+        """代码转行号，新代码追加到末尾
+        """
+        index = self.index
+        rows = numpy.fromiter((index.get(code,-1) for code in codes),dtype=numpy.int64,count=len(codes))
+        news = numpy.flatnonzero(rows<0)
+        if len(news):
+            self.__grow(self.size+len(news))
+            for i in news:
+                code = codes[i]
+                row = index.get(code)
+                if row is None:
+                    row = index[code] = self.size
+                    self.codes[row] = code
+                    for group in self.groups.values():
+                        group.labels[row] = group.label(code)
+                    self.size += 1
+                rows[i] = row
+        return rows
+
+    def __column(self,name:str,values:numpy.ndarray) -> numpy.ndarray:
+        column = self.columns.get(name)
+        if column is None:
+            # 数值统一用 float64，缺失值为 nan
+            if values.dtype.kind in "biuf":
+                column = numpy.full(self.capacity,numpy.nan)
+            else:
+                column = numpy.full(self.capacity,None,dtype=object)
+            self.columns[name] = column
+        return column
+
+    def update(self,data:list) -> int:
+        """用推送数据原地更新快照
+
+        Args:
+            data (list): 推送的 data，第一行为字段名称的表格，或者行情字典数组
+
+        Returns:
+            int: 更新的行数
+        """
+        if data and isinstance(data[0],dict):
+            header = list(data[0].keys())
+            data = [header]+[[item.get(name) for name in header] for item in data]
+        with self.lock:
+            # 解码器在解码时会改写缓存的字段名称和类型，多个订阅线程共用一个快照时也要在锁内解码
+            columns = self.decoder.columns(data)
+            codes = columns.get("code")
+            if codes is None or not len(codes): return 0
+            rows = self.__rows(codes)
+            for name,values in columns.items():
+                if name=="code" or len(values)!=len(rows): continue
+                column = self.__column(name,values)
+                try:
+                    column[rows] = values
+                except (TypeError,ValueError):
+                    # 类型不符时改为 object 列
+                    column = self.columns[name] = column.astype(object)
+                    column[rows] = values
+        return len(rows)
+
+    def on_quotes(self,response):
+        """可直接作为 sub_all_quotes/sub_quotes 的回调函数
+        """
+        result = response.result
+        if result and result.get("success"):
+            self.update(result.get("data"))
+
+    def set_groups(self,by:str,mapping:dict):
+        """设置分组，例如行业、概念、地域
+
+        Args:
+            by (str): 分组名称，例如 hangye
+            mapping (dict): {代码:分组}
+        """
+        with self.lock:
+            group = _Group(mapping,self.capacity)
+            for row in range(self.size):
+                group.labels[row] = group.label(self.codes[row])
+            self.groups[by] = group
+
+    def set_volume_base(self,mapping:dict):
+        """设置计算量比的基准成交量
+
+        Args:
+            mapping (dict): {代码:过去5日平均每日成交量}
+        """
+        with self.lock:
+            self.__rows(list(mapping.keys()))
+            column = self.__column("base_vol",numpy.empty(0))
+            for code,vol in mapping.items():
+                column[self.index[code]] = vol
+
+    def field(self,name:str,minutes:int=None) -> numpy.ndarray:
+        """读取字段列，支持计算字段 change 涨跌幅 和 volume_ratio 量比
+
+        Args:
+            name (str): 字段名称
+            minutes (int, optional): 量比使用的已交易分钟数. Defaults to 按当前时间计算.
+
+        Returns:
+            numpy.ndarray: 当前所有证券的列视图
+        """
+        size = self.size
+        if name=="code": return self.codes[:size]
+        if name=="change":
+            price = self.field("price")
+            last = self.field("last")
+            with numpy.errstate(divide="ignore",invalid="ignore"):
+                return (price/last-1)*100
+        if name=="volume_ratio":
+            vol = self.field("vol")
+            base = self.field("base_vol")
+            with numpy.errstate(divide="ignore",invalid="ignore"):
+                return vol/(base/TRADE_MINUTES*(minutes or trade_minutes()))
+        column = self.columns.get(name)
+        if column is None: return numpy.full(size,numpy.nan)
+        return column[:size]
+
+    def mask(self,**ranges) -> numpy.ndarray:
+        """按字段区间筛选
+
+        snapshot.mask(tr=(5,None),change=(None,-3))
+
+        Returns:
+            numpy.ndarray: 布尔数组
+        """
+        with self.lock:
+            mask = numpy.ones(self.size,dtype=bool)
+            for name,(low,high) in ranges.items():
+                values = self.field(name)
+                if low is not None: mask &= values>=low
+                if high is not None: mask &= values<=high
+            return mask
+
+    def select(self,fields:list=None,**ranges) -> pandas.DataFrame:
+        """按字段区间筛选，返回符合条件的行情
+
+        Args:
+            fields (list, optional): 返回的字段. Defaults to 全部字段.
+
+        Returns:
+            pandas.DataFrame: 筛选结果
+        """
+        with self.lock:
+            return self.frame(numpy.flatnonzero(self.mask(**ranges)),fields)
+
+    def top(self,n:int=10,by:str="change",ascending:bool=False,fields:list=None) -> pandas.DataFrame:
+        """按字段排序取前N个，空值排在最后
+
+        Args:
+            n (int, optional): 数量. Defaults to 10.
+            by (str, optional): 排序字段. Defaults to "change".
+            ascending (bool, optional): 是否升序. Defaults to False.
+            fields (list, optional): 返回的字段. Defaults to 全部字段.
+
+        Returns:
+            pandas.DataFrame: 排序结果
+        """
+        with self.lock:
+            values = numpy.asarray(self.field(by),dtype=float)
+            keys = numpy.where(numpy.isnan(values),numpy.inf,values if ascending else -values)
+            n = min(n,len(keys))
+            if n<=0: return self.frame(numpy.empty(0,dtype=numpy.int64),fields)
+            rows = numpy.argpartition(keys,n-1)[:n]
+            rows = rows[numpy.argsort(keys[rows],kind="stable")]
+            result = self.frame(rows,fields)
+            result[by] = values[rows]
+            return result
+
+    def aggregate(self,by:str="hangye",field:str="change",func:str="mean") -> pandas.Series:
+        """分组聚合
+
+        Args:
+            by (str, optional): 分组名称，需要先 set_groups. Defaults to "hangye".
+            field (str, optional): 聚合字段. Defaults to "change".
+            func (str, optional): mean/sum/count/max/min. Defaults to "mean".
+
+        Returns:
+            pandas.Series: 按分组名称索引的结果
+        """
+        with self.lock:
+            group = self.groups[by]
+            labels = group.labels[:self.size]
+            values = numpy.asarray(self.field(field),dtype=float)
+            valid = (labels>=0) & ~numpy.isnan(values)
+            labels = labels[valid]
+            values = values[valid]
+            length = len(group.names)
+            if func in ("max","min"):
+                result = numpy.full(length,func=="max" and -numpy.inf or numpy.inf)
+                (func=="max" and numpy.maximum or numpy.minimum).at(result,labels,values)
+                result[numpy.isinf(result)] = numpy.nan
+            else:
+                count = numpy.bincount(labels,minlength=length)
+                if func=="count":
+                    result = count
+                else:
+                    result = numpy.bincount(labels,weights=values,minlength=length)
+                    if func=="mean":
+                        with numpy.errstate(divide="ignore",invalid="ignore"):
+                            result = result/count
+            return pandas.Series(result,index=list(group.names),name=field)
+
+    def frame(self,rows:numpy.ndarray=None,fields:list=None) -> pandas.DataFrame:
+        """指定行转成 DataFrame
+
+        Args:
+            rows (numpy.ndarray, optional): 行号. Defaults to 全部行.
+            fields (list, optional): 字段. Defaults to 全部字段.
+
+        Returns:
+            pandas.DataFrame: 行情
+        """
+        with self.lock:
+            if rows is None: rows = numpy.arange(self.size)
+            fields = fields or list(self.columns.keys())
+            datas = {"code":self.codes[rows]}
+            for name in fields:
+                if name!="code": datas[name] = self.field(name)[rows]
+            return pandas.DataFrame(datas)
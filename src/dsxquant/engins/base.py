@@ -1,4 +1,5 @@
-from typing import List
+from collections import deque
+from typing import Deque, List
 import threading
 from dsxquant.engins.event_model import EventModel
 from dsxquant import logger
@@ -9,10 +10,15 @@ class BaseEngin:
     __interface_execute = "execute"
     def __init__(self,event_types:List[EventType]=None):
       self.exit = False
-      self.events:List[EventModel] = []
+      # 收件箱，先进先出
+      self.events:Deque[EventModel] = deque()
+      # 收件箱容量，超过时 put 等待，0 不限制
+      self.maxsize = 0
       self.event:EventModel = None
       self.event_type:List[EventType] = event_types
       self.event_bus = None
+      # 没有事件时线程在条件变量上等待，收到事件再唤醒
+      self.cond = threading.Condition()
     
     def receive(self,event:EventModel):
         """接收事件总线的事件
@@ -24,8 +30,40 @@ class BaseEngin:
             if event.type not in self.event_type:
                 return
         if event.bus:self.event_bus = event.bus
-        self.events.append(event)
-    
+        with self.cond:
+            self.events.append(event)
+            self.cond.notify()
+
+    def put(self,event:EventModel,timeout:float=None) -> bool:
+        """直接投递事件，收件箱满时等待引擎处理，给生产者施加反压
+        总线线程不能在这里等待，总线转发的事件走 receive
+
+        Args:
+            event (EventModel): 事件
+            timeout (float, optional): 最多等待的秒数. Defaults to 一直等待.
+
+        Returns:
+            bool: 是否投递成功
+        """
+        with self.cond:
+            if self.maxsize>0:
+                if not self.cond.wait_for(lambda: self.exit or len(self.events)<self.maxsize,timeout):
+                    return False
+            if self.exit: return False
+            if event.bus:self.event_bus = event.bus
+            self.events.append(event)
+            self.cond.notify_all()
+        return True
+
+    def subscriptions(self) -> list:
+        """向总线声明订阅的事件，安装时调用，只接收发给本引擎的事件
+
+        Returns:
+            list: [(目标,事件类型)]，事件类型为None表示全部类型
+        """
+        if self.event_type:
+            return [(self.__class__,event_type) for event_type in self.event_type]
+        return [(self.__class__,None)]
     
     def sendbus(self,event:EventModel):
         """反馈信号
@@ -44,14 +82,21 @@ class BaseEngin:
             logger.warning("event bus not available")
     
     def get_current_event(self):
-        if self.events.__len__()>0:
+        if self.events:
             self.event = self.events[0]
             return self.event
 
     def destroy(self):
-        if self.events.__len__()>0:
-            if self.event in self.events:
-                self.events.remove(self.event)
+        if self.event is not None and self.events:
+            with self.cond:
+                # 当前事件总是队首，出队是 O(1)
+                if self.events[0] is self.event:
+                    self.events.popleft()
+                elif self.event in self.events:
+                    self.events.remove(self.event)
+                # 唤醒等待空位的生产者
+                if self.maxsize>0 and len(self.events)==self.maxsize-1:
+                    self.cond.notify_all()
         self.event = None
     
     def start(self):
@@ -69,11 +114,37 @@ class BaseEngin:
         """
         pass
 
+    def wait(self,predicate=None,timeout:float=None) -> bool:
+        """阻塞等待，直到有事件、条件成立或者引擎关闭
+
+        Args:
+            predicate (callable, optional): 等待的条件. Defaults to 有事件.
+            timeout (float, optional): 超时秒数. Defaults to 一直等待.
+
+        Returns:
+            bool: 条件是否成立
+        """
+        predicate = predicate or (lambda: self.events)
+        with self.cond:
+            return bool(self.cond.wait_for(lambda: self.exit or predicate(),timeout))
+
+    def notify(self):
+        """唤醒等待的线程
+        """
+        with self.cond:
+            self.cond.notify_all()
+
     def next(self):
+        # 没有事件时阻塞，不再空转
+        self.wait()
         self.get_current_event()
-        pass
 
     def shutdown(self):
         """关闭引擎
         """
-        self.exit = True
\ No newline at end of file
+        self.exit = True
+        # 唤醒还在等待处理结果的策略
+        with self.cond:
+            for event in list(self.events):
+                event.set_result(event.status)
+        self.notify()
\ No newline at end of file
@@ -12,7 +12,8 @@ class DataFeed(BaseEngin):
 
     @property
     def engin_cache(self):
-        return Engin.get_instance().cachespace
+        # 缓存空间是类属性，单线程回测没有启动系统引擎时也可以使用
+        return Engin.cachespace
     
     def run(self):
         while(not self.exit):
@@ -29,8 +30,20 @@ class DataFeed(BaseEngin):
             self.next()
     
     def downall(self,etype:EventType,*args):
-        
-        # 下载数据
+        cycle = self.get_cycle(etype)
+        if cycle==None:return
+        klines = self.load(cycle,args[0])
+        if not klines:
+            self.sendevent(EventType.THEEND,klines,self.event.source,source=self)
+            return
+        # 给回测
+        self.sendevent(etype,klines,self.event.source,source=self)
+        # self.sendevent(etype,base_klines,dsxquant.BackTest,source=self.event.source)
+
+    @staticmethod
+    def get_cycle(etype:EventType):
+        """数据事件对应的K线周期，不是K线数据事件返回None
+        """
         cycle = None
         if etype==EventType.DAYLINE:cycle=config.CYCLE.DAY
         if etype==EventType.WEEKLINE:cycle=config.CYCLE.WEEK
@@ -41,15 +54,26 @@ class DataFeed(BaseEngin):
         if etype==EventType.MIN15LINE:cycle=config.CYCLE.M15
         if etype==EventType.MIN30LINE:cycle=config.CYCLE.M30
         if etype==EventType.MIN60LINE:cycle=config.CYCLE.M60
-        if cycle==None:return
+        return cycle
+
+    def load(self,cycle:config.CYCLE,args:tuple):
+        """下载回测需要的K线、基准K线、财务和股本数据，事件驱动和单线程回测共用
+
+        Args:
+            cycle (config.CYCLE): K线周期
+            args (tuple): (代码,市场,复权,开始日期,结束日期,基准代码)
+
+        Returns:
+            tuple: (代码,市场,K线)，获取失败返回None
+        """
+        # 下载数据
         pbar = ProgressBar(100)
         pbar.start()
-        symbol,market,fq,start_date,end_date,base_symbol = args[0]
+        symbol,market,fq,start_date,end_date,base_symbol = args
         klines = self.dayline(symbol,market,fq=fq,cycle=cycle,start=start_date,end=end_date)
         if not klines:
             pbar.update(100)
             logger.error("无法获取K线数据")
-            self.sendevent(EventType.THEEND,klines,self.event.source,source=self)
             return
         pbar.update(25)
         base_klines = self.dayline(base_symbol,market,fq=fq,cycle=cycle,start=start_date,end=end_date)
@@ -58,9 +82,7 @@ class DataFeed(BaseEngin):
         pbar.update(75)
         self.structure(symbol,market,start_date,end_date)
         pbar.update(100)
-        # 给回测
-        self.sendevent(etype,klines,self.event.source,source=self)
-        # self.sendevent(etype,base_klines,dsxquant.BackTest,source=self.event.source)
+        return klines
     
     def dayline(self,symbol:str,market:int,page:int=1,page_size:int=320,fq:str=config.FQ.DEFAULT,cycle:config.CYCLE=config.CYCLE.DAY,start:str=None,end:str=None):
         return self.barline(symbol,market,page,page_size,fq,cycle,start,end)
@@ -30,18 +30,28 @@ class EmulationEngin(BaseEngin):
         """
         self.emulations.append(emulation)
     
+    def handle(self,event:EventModel):
+        """撮合交易信号，设置结果后唤醒等待的策略，事件线程和单线程回测共用
+
+        Args:
+            event (EventModel): 买入、卖出、撤单事件
+        """
+        for emulation in self.emulations:
+            if emulation.__type__==event.type:
+                if type(emulation)==type: emulation = emulation(event)
+                if hasattr(emulation,self.__interface_execute):
+                    execute = getattr(emulation,self.__interface_execute)
+                    if callable(execute):
+                        result = execute()
+                        # 模拟交易都是成功的
+                        event.set_result(result)
+        # 没有对应的仿真交易也要唤醒等待的策略
+        event.set_result(event.status)
+
     def run(self):
         while(not self.exit):
             if self.event and self.event.target==self.__class__:
-                for emulation in self.emulations:
-                    if emulation.__type__==self.event.type:
-                        if type(emulation)==type: emulation = emulation(self.event)
-                        if hasattr(emulation,self.__interface_execute):
-                            execute = getattr(emulation,self.__interface_execute)
-                            if callable(execute):
-                                result = execute()
-                                # 模拟交易都是成功的
-                                self.event.status = result
+                self.handle(self.event)
             if self.event:
                 if self.event.type==EventType.THEEND:
                     pass
@@ -3,6 +3,7 @@
 """
 import threading
 import time
+from collections import deque
 from dsxquant.engins.event_model import EventModel
 from dsxquant import logger,EventType
 
@@ -11,23 +12,46 @@ class EventBus:
     __plugin_interface = "receive"
     # 插件的卸载接口
     __plugin_shutdown = "shutdown"
+    # 插件的订阅接口
+    __plugin_subscriptions = "subscriptions"
 
     def __init__(self) -> None:
         self.exit = False
-        self.events = []
+        # 待分发的事件，先进先出
+        self.events = deque()
         self.plugins = []
+        # 路由表 (目标,事件类型) -> 插件，事件类型为None表示订阅该目标的全部事件
+        self.routes = {}
+        # 没有声明订阅的插件，接收全部事件
+        self.listeners = []
         self.current_event:EventModel = EventModel()
         self.lock = threading.Lock()
+        # 没有事件时总线线程在条件变量上等待
+        self.cond = threading.Condition()
         threading.Thread(target=self.run).start()
         pass
 
     def install(self,plugin):
         """安装插件
+        插件实现 subscriptions 接口时按返回的 [(目标,事件类型)] 订阅，只接收订阅的事件，
+        没有实现时接收全部事件
 
         Args:
             plugin (_type_): _description_
         """
-        self.plugins.append(plugin)
+        with self.lock:
+            self.plugins.append(plugin)
+            subscriptions = None
+            if hasattr(plugin,self.__plugin_subscriptions):
+                subscriptions = getattr(plugin,self.__plugin_subscriptions)()
+            if subscriptions:
+                for key in subscriptions:
+                    plugins = self.routes.setdefault(tuple(key),[])
+                    if plugin not in plugins: plugins.append(plugin)
+            else:
+                self.listeners.append(plugin)
+        # 唤醒等待插件的总线线程
+        self.notify()
         self.send_event_to_plugin(plugin,EventModel(self,target=plugin.__class__))
         # logger.info("%s plugin is installed" % plugin)
 
@@ -38,7 +62,13 @@ class EventBus:
             plugin (_type_): _description_
         """
         if plugin in self.plugins:
-            self.plugins.remove(plugin)
+            with self.lock:
+                self.plugins.remove(plugin)
+                if plugin in self.listeners: self.listeners.remove(plugin)
+                for key,plugins in list(self.routes.items()):
+                    if plugin in plugins: plugins.remove(plugin)
+                    if not plugins: del self.routes[key]
+            self.notify()
             logger.info("%s plugin is uninstalled" % plugin)
 
     def register(self,model:EventModel):
@@ -48,7 +78,9 @@ class EventBus:
         Args:
             model (EventModel): _description_
         """
-        self.events.append(model)
+        with self.cond:
+            self.events.append(model)
+            self.cond.notify()
         # logger.info("%s event is registed" % model.type)
     
     def unregister(self,model:EventModel):
@@ -56,14 +88,24 @@ class EventBus:
         Args:
             model (EventModel): _description_
         """
-        if model in self.events:
-            self.events.remove(model)
+        with self.lock:
+            if model in self.events:
+                self.events.remove(model)
             # logger.info("%s event is unregisted" % model.type)
     
     def get_last_event():
         pass
     
+    def notify(self):
+        """唤醒总线线程
+        """
+        with self.cond:
+            self.cond.notify_all()
+
     def next_event(self):
+        # 没有插件或者没有事件时阻塞，install 和 register 时唤醒
+        with self.cond:
+            self.cond.wait_for(lambda: self.exit or (self.plugins and self.events))
         with self.lock:
             if self.events.__len__()>0:
                 self.current_event = self.events[0]
@@ -74,7 +116,10 @@ class EventBus:
         with self.lock:
             if self.current_event:
                 if self.current_event.count<=0:
-                    if self.current_event in self.events:
+                    # 当前事件总是队首，出队是 O(1)
+                    if self.events and self.events[0] is self.current_event:
+                        self.events.popleft()
+                    elif self.current_event in self.events:
                         self.events.remove(self.current_event)
                 self.current_event = None
     
@@ -82,6 +127,11 @@ class EventBus:
         """关闭总线
         """
         self.exit = True
+        with self.cond:
+            # 不再分发的事件，唤醒等待处理结果的策略
+            for event in list(self.events):
+                event.set_result(event.status)
+            self.cond.notify_all()
         # 卸载插件
         for plugin in self.plugins:
             if hasattr(plugin,self.__plugin_shutdown):
@@ -90,6 +140,23 @@ class EventBus:
         
         logger.debug("总线关闭")
     
+    def get_plugins(self,event:EventModel) -> list:
+        """查找订阅了事件的插件，按 (目标,事件类型) 查路由表，不再逐个插件广播
+        没有目标的事件广播给全部插件
+
+        Args:
+            event (EventModel): 事件
+
+        Returns:
+            list: 插件列表
+        """
+        if event.target is None: return list(self.plugins)
+        plugins = list(self.listeners)
+        for key in ((event.target,event.type),(event.target,None)):
+            for plugin in self.routes.get(key,()):
+                if plugin not in plugins: plugins.append(plugin)
+        return plugins
+
     def send_event_to_plugin(self,plugin,event:EventModel):
         """给插件发送事件
 
@@ -116,12 +183,57 @@ class EventBus:
                 # 每个插件必须实现事件接收
                 if self.current_event:
                     with self.lock:
-                        for plugin in self.plugins:
+                        for plugin in self.get_plugins(self.current_event):
                             self.send_event_to_plugin(plugin,self.current_event)
                     # if self.current_event.type==EventType.THEEND:
                     #     # 结束回测
                     #     break 
                 # 销毁
                 self.destroy()
-                # 下一个事件
-                self.next_event()
+            # 下一个事件
+            self.next_event()
+
+
+class SyncEventBus:
+    """同步事件总线
+    register 时直接在当前线程调用目标插件的 handle 接口，不排队也不启动线程，
+    事件按发出的顺序处理完才返回，用于单线程回测
+    """
+    # 插件的同步处理接口
+    __plugin_interface = "handle"
+
+    def __init__(self) -> None:
+        self.exit = False
+        self.plugins = []
+        # 目标 -> 插件
+        self.routes = {}
+
+    def install(self,*plugins):
+        """安装插件，按插件的类型路由事件
+        """
+        for plugin in plugins:
+            self.plugins.append(plugin)
+            self.routes[plugin.__class__] = plugin
+
+    def register(self,model:EventModel):
+        """处理事件，处理完成后返回
+
+        Args:
+            model (EventModel): _description_
+        """
+        model.bus = self
+        if model.target is None:
+            plugins = self.plugins
+        else:
+            plugin = self.routes.get(model.target)
+            plugins = plugin and [plugin] or []
+        for plugin in plugins:
+            if hasattr(plugin,self.__plugin_interface):
+                handle = getattr(plugin,self.__plugin_interface)
+                if callable(handle):
+                    handle(model)
+        # 没有插件处理也不能让等待结果的策略阻塞
+        model.set_result(model.status)
+
+    def shutdown(self):
+        self.exit = True
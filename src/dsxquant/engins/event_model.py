@@ -1,3 +1,4 @@
+from concurrent.futures import Future
 from dsxquant import EventType
 import datetime
 class EventModel:
@@ -21,12 +22,36 @@ class EventModel:
         self.cursor = cursor
         # 事件处理状态
         self.status = status
+        # 等待处理结果时才创建，处理引擎完成后唤醒等待的线程
+        self.future:Future = None
     
     def success(self):
-        self.status = True
+        self.set_result(True)
     
     def fail(self):
-        self.status = False
+        self.set_result(False)
+
+    def set_result(self,result):
+        """设置处理结果，唤醒等待结果的线程
+
+        Args:
+            result (any): 处理结果，例如仿真交易是否成交
+        """
+        self.status = result
+        if self.future and not self.future.done():
+            self.future.set_result(result)
+
+    def result(self,timeout:float=None):
+        """等待处理结果
+
+        Args:
+            timeout (float, optional): 最多等待的秒数. Defaults to 一直等待.
+
+        Returns:
+            any: 处理结果，没有等待时直接返回当前状态
+        """
+        if self.future: return self.future.result(timeout)
+        return self.status
     
     def copy(self):
         e = EventModel(self.bus,self.type,self.data,self.target,self.cursor,self.source,self.status)
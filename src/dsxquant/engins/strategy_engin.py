@@ -3,7 +3,9 @@ from typing import Dict, List
 from dsxquant.strategy.base import BaseStrategy    
 from dsxquant.config.logconfig import logger
 from dsxquant.engins.base import BaseEngin
+from dsxquant.engins.event_model import EventModel
 from dsxquant import EventType
+from dsxquant.config import config
 from progressbar import ProgressBar
 
 class StrategyEngin(BaseEngin):
@@ -15,6 +17,8 @@ class StrategyEngin(BaseEngin):
         super().__init__(event_types)
         self.strategies:List[BaseStrategy] = []
         self.strategies_test:Dict[BaseStrategy] = {}
+        # 回测逐根推送K线，收件箱满时回测线程等待
+        self.maxsize = config.ENGIN_QUEUE_SIZE
    
     def register(self,strategy:BaseStrategy):
         """注册需要执行的策略
@@ -23,6 +27,7 @@ class StrategyEngin(BaseEngin):
             strategy (BaseStrategy): _description_
         """
         self.strategies.append(strategy)
+        self.notify()
 
     def unregister(self,strategy:BaseStrategy):
         """注册需要执行的策略
@@ -34,36 +39,39 @@ class StrategyEngin(BaseEngin):
             self.strategies.remove(strategy)
 
 
+    def handle(self,event:EventModel):
+        """加载事件数据后执行策略，事件线程和单线程回测共用
+
+        Args:
+            event (EventModel): K线事件
+        """
+        for strategy in list(self.strategies):
+            if event.source in self.strategies_test.keys():
+                strategy = self.strategies_test.get(event.source)
+            if type(strategy)==type: 
+                strategy = strategy(event)
+                self.strategies_test[event.source] = strategy
+            if strategy.__type__==event.type or event.type in strategy.__type__:
+                # load
+                if hasattr(strategy,self.__interface_load):
+                    load = getattr(strategy,self.__interface_load)
+                    if callable(load):
+                        load(event)
+                # execute
+                if hasattr(strategy,self.__interface_execute):
+                    execute = getattr(strategy,self.__interface_execute)
+                    if callable(execute):
+                        execute(event)
+            else:
+                if event.type!=EventType.THEEND : logger.debug("策略与事件数据类型不匹配")
+
     def run(self):
-        real = False
         end_count = 0
         while(not self.exit):
             if self.strategies:
                 if self.event and self.event.target==self.__class__:
                     if self.event.type!=EventType.NONE:
-                        i = 0
-                        for strategy in list(self.strategies):
-                            if self.event.source in self.strategies_test.keys():
-                                strategy = self.strategies_test.get(self.event.source)
-                            if type(strategy)==type: 
-                                strategy = strategy(self.event)
-                                self.strategies_test[self.event.source] = strategy
-                            if strategy.__type__==self.event.type or self.event.type in strategy.__type__:
-                                # load
-                                if hasattr(strategy,self.__interface_load):
-                                    load = getattr(strategy,self.__interface_load)
-                                    if callable(load):
-                                        load(self.event)
-                                if hasattr(strategy,"real"):
-                                    real = getattr(strategy,"real")
-                                # execute
-                                if hasattr(strategy,self.__interface_execute):
-                                    execute = getattr(strategy,self.__interface_execute)
-                                    if callable(execute):
-                                        execute(self.event)
-                            else:
-                                if self.event.type!=EventType.THEEND : logger.debug("策略与事件数据类型不匹配")
-                                    
+                        self.handle(self.event)
                         if self.event.type==EventType.THEEND and self.event.target==self.__class__:
                             # 最后一个策略运行完毕
                             # 结束回测,通知其他组件
@@ -72,10 +80,11 @@ class StrategyEngin(BaseEngin):
                                 self.event.target=None
                                 self.sendbus(self.event)
                                 # break
-                                    
-                            i += 1
                 # 处理后销毁
                 self.destroy()
                 self.next()
+            else:
+                # 没有策略时等待注册
+                self.wait(lambda: self.strategies)
     
         logger.debug("策略引擎关闭")
\ No newline at end of file
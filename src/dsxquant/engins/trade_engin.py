@@ -41,7 +41,10 @@ class TradeEngin(BaseEngin):
                             method = getattr(trade,self.__interface_execute)
                             if callable(method):
                                 event = method()
+                                # 和仿真交易一样用交易是否成功作为结果，交易返回事件时取事件的状态
+                                self.event.set_result(event.status if isinstance(event,EventModel) else event)
                                 self.sendbus(event)
+                self.event.set_result(self.event.status)
             if self.event:
                 if self.event.type==EventType.THEEND:
                         # 结束回测
@@ -1,4 +1,5 @@
-from dsxquant import EventType,config,EventModel,EmulationEngin,TradeEngin,MARKET
+from concurrent.futures import Future,TimeoutError as FutureTimeoutError
+from dsxquant import EventType,config,EventModel,EmulationEngin,TradeEngin,MARKET,logger
 from dsxquant.strategy.data_model import DataModel
 from dsxindexer.sindexer.models.kline_model import KlineModel
 from progressbar import ProgressBar
@@ -38,6 +39,8 @@ class BaseStrategy:
         self.take_profit = 0
         # 止损
         self.stop_loss = 0
+        # 等待交易信号的执行结果，最多等待 config.SIGNAL_TIMEOUT 秒，False 时发出信号后立即返回，需要结果时调用 EventModel.result()
+        self.wait_signal = True
         # 进度条
         self.pbar = ProgressBar()
         self.pbar.start()
@@ -90,9 +93,15 @@ class BaseStrategy:
         event_sinal = EventModel(self.event.bus,etype,data,target=target,source=self.event.source)
         if self.event:
             if self.event.bus:
+                # 交易引擎处理完成后设置结果，等待时不占用CPU
+                event_sinal.future = Future()
                 self.event.bus.register(event_sinal)
-                while(not event_sinal.status):
-                    pass
+                if self.wait_signal:
+                    try:
+                        event_sinal.result(config.SIGNAL_TIMEOUT or None)
+                    except FutureTimeoutError:
+                        # 没有引擎处理时不能一直阻塞回测，返回未处理的状态
+                        logger.warning("signal %s not handled by %s in %s seconds" % (etype,target.__name__,config.SIGNAL_TIMEOUT))
         return event_sinal
     
     def buy(self,name,symbol:str,market:int,amount:int,price:float,date:str,desc="买点"):